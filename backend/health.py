@@ -0,0 +1,172 @@
+"""
+Liveness and readiness for the serving endpoint.
+
+A background prober checks the endpoint's state with a cheap workspace
+metadata call on an interval, instead of generating tokens. Live traffic
+(every query_endpoint call) feeds a rolling window of latencies and errors,
+bounded by count and by age so an old error burst stops counting once it ages out.
+Both are folded into a cached readiness snapshot that health routes return
+as-is, so load balancers can poll it as often as they like.
+
+Readiness statuses:
+    unknown    no probe has completed yet
+    ready      endpoint is READY and recent traffic is within thresholds
+    degraded   endpoint is serving, but latency/error rate is over threshold,
+               the last probe failed, or a config update failed
+    not_ready  endpoint reports NOT_READY, or probes keep failing
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(len(ordered) * fraction), len(ordered) - 1)
+    return ordered[index]
+
+
+class HealthMonitor:
+    def __init__(self, endpoint, probe, interval_seconds=30, probe_latency_threshold_ms=2000,
+                 latency_threshold_ms=30000, error_rate_threshold=0.25, window_size=50,
+                 window_seconds=300, min_samples=5, max_probe_failures=3):
+        self.endpoint = endpoint
+        self.probe = probe
+        self.interval_seconds = interval_seconds
+        self.probe_latency_threshold_ms = probe_latency_threshold_ms
+        self.latency_threshold_ms = latency_threshold_ms
+        self.error_rate_threshold = error_rate_threshold
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.max_probe_failures = max_probe_failures
+        # (recorded_at, latency_ms, ok) for recent endpoint calls
+        self._calls = deque(maxlen=window_size)
+        self._lock = threading.Lock()
+        self._probe_result = None
+        self._probe_error = None
+        self._probe_latency_ms = None
+        self._probe_at = None
+        self._consecutive_probe_failures = 0
+        self._task = None
+        self._snapshot = {"status": "unknown", "endpoint": endpoint, "reasons": ["No probe has completed yet"]}
+
+    def record_call(self, endpoint_name, latency_ms, error):
+        """Call observer for query_endpoint; feeds the latency/error window."""
+        if endpoint_name != self.endpoint:
+            return
+        with self._lock:
+            self._calls.append((time.time(), latency_ms, error is None))
+        self._refresh()
+
+    def probe_once(self):
+        """Run one metadata probe synchronously and update the snapshot."""
+        started = time.perf_counter()
+        try:
+            result = self.probe(self.endpoint)
+            error = None
+        except Exception as e:
+            result = None
+            error = e
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self._probe_at = time.time()
+            self._probe_latency_ms = latency_ms
+            if error is None:
+                self._probe_result = result
+                self._probe_error = None
+                self._consecutive_probe_failures = 0
+            else:
+                self._probe_error = str(error)
+                self._consecutive_probe_failures += 1
+        if error is not None:
+            logger.warning(f"Health probe for {self.endpoint} failed: {error}")
+        self._refresh()
+        return self.snapshot()
+
+    def _refresh(self):
+        """Recompute the cached snapshot from the latest probe and traffic window."""
+        with self._lock:
+            # Runs on every probe too, so samples age out even when there is no traffic
+            horizon = time.time() - self.window_seconds
+            while self._calls and self._calls[0][0] < horizon:
+                self._calls.popleft()
+            calls = list(self._calls)
+            probe_result = self._probe_result
+            reasons = []
+
+            latencies = [latency for _, latency, _ in calls]
+            errors = sum(1 for _, _, ok in calls if not ok)
+            error_rate = errors / len(calls) if calls else None
+            p95_latency_ms = _percentile(latencies, 0.95)
+
+            if probe_result is None and self._probe_at is None:
+                status = "unknown"
+                reasons.append("No probe has completed yet")
+            elif self._consecutive_probe_failures >= self.max_probe_failures:
+                status = "not_ready"
+                reasons.append(f"{self._consecutive_probe_failures} consecutive probe failures: {self._probe_error}")
+            elif probe_result is not None and not probe_result.get("ready"):
+                status = "not_ready"
+                reasons.append(f"Endpoint state is {probe_result.get('ready_state')}")
+            else:
+                status = "ready"
+                if self._probe_error is not None:
+                    reasons.append(f"Last probe failed: {self._probe_error}")
+                if probe_result is None:
+                    reasons.append("Endpoint state not yet known")
+                elif probe_result.get("config_update") == "UPDATE_FAILED":
+                    reasons.append("Last endpoint config update failed")
+                if self._probe_latency_ms is not None and self._probe_latency_ms > self.probe_latency_threshold_ms:
+                    reasons.append(f"Probe latency {self._probe_latency_ms:.0f}ms over {self.probe_latency_threshold_ms}ms")
+                if len(calls) >= self.min_samples:
+                    if p95_latency_ms > self.latency_threshold_ms:
+                        reasons.append(f"p95 request latency {p95_latency_ms:.0f}ms over {self.latency_threshold_ms}ms")
+                    if error_rate > self.error_rate_threshold:
+                        reasons.append(f"Error rate {error_rate:.0%} over {self.error_rate_threshold:.0%}")
+                if reasons:
+                    status = "degraded"
+
+            self._snapshot = {
+                "status": status,
+                "endpoint": self.endpoint,
+                "reasons": reasons,
+                "endpoint_state": probe_result,
+                "last_probe_at": self._probe_at,
+                "probe_latency_ms": self._probe_latency_ms,
+                "recent_requests": len(calls),
+                "error_rate": error_rate,
+                "p95_latency_ms": p95_latency_ms,
+            }
+
+    def snapshot(self):
+        """Return the cached readiness snapshot; never touches the endpoint."""
+        return self._snapshot
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.probe_once)
+            except Exception as e:
+                logger.warning(f"Health probe loop error: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
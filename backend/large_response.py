@@ -0,0 +1,114 @@
+"""
+Bounded-memory handling for very large assistant answers.
+
+Answers above a size threshold are spilled to content-addressed blob files and
+referenced from chat history by id, so the process keeps at most one in-memory
+copy of an answer for the duration of a request. Responses are streamed to the
+client as JSON in fixed-size chunks instead of being serialized into one big
+string first.
+"""
+import hashlib
+import json
+import os
+import tempfile
+
+CHUNK_CHARS = 64 * 1024
+# Dedicated suffixes so the store never touches other files in its directory
+BLOB_SUFFIX = ".chatblob"
+TMP_SUFFIX = ".chatblob.tmp"
+
+
+def iter_text_chunks(text, chunk_chars=CHUNK_CHARS):
+    """Yield fixed-size slices of text; only one slice is materialized at a time."""
+    for start in range(0, len(text), chunk_chars):
+        yield text[start:start + chunk_chars]
+
+
+def iter_json_message(chunks, timestamp, request_id, html=None):
+    """
+    Stream a ChatResponse-shaped JSON object whose message is built from text chunks.
+    Produces the same document as json.dumps({"message": ..., "html": ..., "timestamp": ...,
+    "request_id": ...}), with "html" present only when given; html is streamed in chunks too.
+    """
+    yield '{"message": "'
+    for chunk in chunks:
+        # Chunks are sliced by code point, so escaping each one separately is lossless
+        yield json.dumps(chunk)[1:-1]
+    if html is not None:
+        yield '", "html": "'
+        for chunk in iter_text_chunks(html):
+            yield json.dumps(chunk)[1:-1]
+    yield '", ' + json.dumps({"timestamp": timestamp, "request_id": request_id})[1:]
+
+
+class BlobStore:
+    """Disk-backed, content-addressed storage for large assistant answers."""
+
+    def __init__(self, directory, spill_chars):
+        self.directory = directory
+        self.spill_chars = spill_chars
+
+    def should_spill(self, text):
+        return self.spill_chars > 0 and text is not None and len(text) > self.spill_chars
+
+    def _path(self, blob_id):
+        # Blob ids are sha256 hex digests; reject anything else so ids can't escape the directory
+        if len(blob_id) != 64 or any(c not in "0123456789abcdef" for c in blob_id):
+            raise KeyError(blob_id)
+        return os.path.join(self.directory, f"{blob_id}{BLOB_SUFFIX}")
+
+    def put(self, text):
+        """Write text to disk chunk by chunk and return its blob id."""
+        os.makedirs(self.directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter_text_chunks(text):
+                    data = chunk.encode("utf-8")
+                    digest.update(data)
+                    f.write(data)
+            blob_id = digest.hexdigest()
+            path = self._path(blob_id)
+            if os.path.exists(path):
+                # Identical answer already stored; keep the single existing copy
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob_id
+
+    def exists(self, blob_id):
+        try:
+            return os.path.exists(self._path(blob_id))
+        except KeyError:
+            return False
+
+    def iter_chunks(self, blob_id, chunk_chars=CHUNK_CHARS):
+        """
+        Return an iterator over the stored text in chunks without loading the whole blob.
+        The file is opened immediately, so a stream keeps working if the blob is deleted meanwhile.
+        """
+        return _iter_file(open(self._path(blob_id), encoding="utf-8"), chunk_chars)
+
+    def read(self, blob_id):
+        with open(self._path(blob_id), encoding="utf-8") as f:
+            return f.read()
+
+    def delete(self, blob_id):
+        try:
+            os.remove(self._path(blob_id))
+        except (KeyError, OSError):
+            pass
+
+
+def _iter_file(f, chunk_chars):
+    with f:
+        while True:
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                break
+            yield chunk
@@ -4,16 +4,28 @@ from typing import List, Optional
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from datetime import datetime
 import json
+import threading
 
 # Import the existing model serving utilities
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from model_serving_utils import query_endpoint, endpoint_supports_feedback, submit_feedback
+from model_serving_utils import query_endpoint, endpoint_supports_feedback, submit_feedback, warm_up_imports, add_call_observer, get_endpoint_state
+from backend.response_cache import ResponseCache
+from backend.prefetch import Prefetcher
+from backend.profiling import SlowRequestProfiler
+from backend.large_response import BlobStore, iter_json_message, iter_text_chunks
+from backend.health import HealthMonitor
+from request_timing import start_timer, stop_timer, mark_admitted, span
+from markdown_render import render_markdown_cached
+from generation_policy import load_policy_from_env, split_params
+from token_usage import get_usage_tracker, QuotaExceeded
 
 # --- Logging Setup ---
 logging.basicConfig(
@@ -38,6 +50,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Request timing and profiling ---
+# Timing is opt-in: enabled for every API request, or per request via the X-Request-Timing
+# header when the server allows clients to ask for it
+REQUEST_TIMING_ENABLED = os.getenv("REQUEST_TIMING_ENABLED", "false").lower() == "true"
+REQUEST_TIMING_HEADER_ENABLED = os.getenv("REQUEST_TIMING_HEADER_ENABLED", "false").lower() == "true"
+
+slow_request_profiler = SlowRequestProfiler(
+    directory=os.getenv("PROFILE_DIR", "profiles"),
+    sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    keep_slowest=int(os.getenv("PROFILE_KEEP_SLOWEST", "10")),
+)
+
+def request_wants_timing(request: Request):
+    return request.headers.get("x-request-timing", "").strip().lower() in ("1", "true", "yes", "on")
+
+@app.middleware("http")
+async def request_timing_middleware(request: Request, call_next):
+    """Record per-request spans and return them in a Server-Timing header"""
+    if not request.url.path.startswith("/api/") or not (
+        REQUEST_TIMING_ENABLED or (REQUEST_TIMING_HEADER_ENABLED and request_wants_timing(request))
+    ):
+        return await call_next(request)
+
+    timer, token = start_timer()
+    profiler = slow_request_profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        if profiler is not None:
+            slow_request_profiler.stop(profiler)
+            # Dumping the capture is file I/O; keep it off the event loop
+            await run_in_threadpool(slow_request_profiler.save, profiler, request.url.path, timer.total_ms())
+        stop_timer(token)
+    response.headers["Server-Timing"] = timer.server_timing_header()
+    return response
+
 @app.on_event("startup")
 async def startup_event():
     """Log startup information"""
@@ -47,6 +95,17 @@ async def startup_event():
     logger.info(f"Static directory exists: {os.path.exists(static_dir)}")
     if os.path.exists(static_dir):
         logger.info(f"Static files: {os.listdir(static_dir)}")
+    threading.Thread(target=warm_up, name="startup-warm-up", daemon=True).start()
+    if PREFETCH_ENABLED:
+        logger.info(f"Starting prefetcher (max {prefetcher.budget.max_per_hour} requests/hour)")
+        prefetcher.start()
+    health_monitor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks"""
+    await prefetcher.stop()
+    await health_monitor.stop()
 
 # Get serving endpoint from environment
 SERVING_ENDPOINT = os.getenv('SERVING_ENDPOINT')
@@ -57,13 +116,22 @@ if not SERVING_ENDPOINT:
 else:
     logger.info(f"Using configured Databricks endpoint: {SERVING_ENDPOINT}")
 
-# Safely check endpoint support with error handling
-try:
-    ENDPOINT_SUPPORTS_FEEDBACK = endpoint_supports_feedback(SERVING_ENDPOINT)
-    logger.info(f"Endpoint feedback support: {ENDPOINT_SUPPORTS_FEEDBACK}")
-except Exception as e:
-    logger.warning(f"Could not check endpoint feedback support: {str(e)}")
-    ENDPOINT_SUPPORTS_FEEDBACK = False
+# Feedback support is checked by the startup warm-up thread, so importing this module
+# neither loads databricks.sdk nor waits on the workspace API. Until the check
+# finishes the endpoint is treated as not supporting feedback.
+ENDPOINT_SUPPORTS_FEEDBACK = False
+
+def warm_up():
+    """Import heavy serving dependencies and check feedback support off the request path"""
+    global ENDPOINT_SUPPORTS_FEEDBACK
+    warm_up_imports(background=False)
+    # Safely check endpoint support with error handling
+    try:
+        ENDPOINT_SUPPORTS_FEEDBACK = endpoint_supports_feedback(SERVING_ENDPOINT)
+        logger.info(f"Endpoint feedback support: {ENDPOINT_SUPPORTS_FEEDBACK}")
+    except Exception as e:
+        logger.warning(f"Could not check endpoint feedback support: {str(e)}")
+        ENDPOINT_SUPPORTS_FEEDBACK = False
 
 # Pydantic models
 class ChatMessage(BaseModel):
@@ -74,15 +142,196 @@ class ChatResponse(BaseModel):
     message: str
     timestamp: str
     request_id: Optional[str] = None
+    # Sanitized HTML rendering of message; omitted for streamed (large) responses
+    html: Optional[str] = None
+    # True when served from the response cache; such answers carry no request_id to give feedback on
+    cached: bool = False
 
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
     serving_endpoint: str
     endpoint_supports_feedback: bool
+    # Reasons the endpoint is not simply healthy, from the cached readiness snapshot
+    reasons: List[str] = []
 
 # In-memory chat history (in production, use a database)
 chat_history = []
+CHAT_HISTORY_LIMIT = 100
+
+# Answers longer than this are streamed to the client in chunks
+STREAMING_THRESHOLD_CHARS = 10000
+
+# Answers longer than this are spilled to disk and referenced from history (0 disables)
+blob_store = BlobStore(
+    directory=os.getenv("BLOB_DIR", "blobs"),
+    spill_chars=int(os.getenv("LARGE_RESPONSE_SPILL_CHARS", str(256 * 1024))),
+)
+
+def append_chat_history(entry):
+    """Append to chat history, dropping the oldest entries and any blobs they alone referenced"""
+    chat_history.append(entry)
+    while len(chat_history) > CHAT_HISTORY_LIMIT:
+        dropped = chat_history.pop(0)
+        blob_id = dropped.get("assistant_blob")
+        # Blobs are content-addressed, so a repeated answer may still be referenced
+        if blob_id and not any(item.get("assistant_blob") == blob_id for item in chat_history):
+            blob_store.delete(blob_id)
+
+# --- Generation policy and token accounting ---
+# Speculative prefetches resolve their budget the same way as /api/chat so cached answers are interchangeable
+generation_policy = load_policy_from_env()
+usage_tracker = get_usage_tracker()
+
+PREFETCH_USER = "system:prefetch"
+
+def request_user(request: Request):
+    """Identify the caller from the headers Databricks Apps forwards"""
+    return (
+        request.headers.get("x-forwarded-email")
+        or request.headers.get("x-forwarded-preferred-username")
+        or request.headers.get("x-forwarded-user")
+        or "anonymous"
+    )
+
+def generation_params(route, prompt, user):
+    """The policy's generation parameters for a request, before any quota cut; used in cache keys"""
+    max_tokens, extra_inputs = split_params(generation_policy.resolve(route, prompt, user))
+    return {"max_output_tokens": max_tokens, **extra_inputs}
+
+def resolve_generation(route, prompt, user):
+    """Resolve (max_tokens, extra_inputs) for a request, within the caller's remaining quota"""
+    max_tokens, extra_inputs = split_params(generation_policy.resolve(route, prompt, user))
+    remaining = usage_tracker.check(user, SERVING_ENDPOINT)
+    if remaining is not None:
+        max_tokens = min(max_tokens, remaining)
+    return max_tokens, extra_inputs
+
+def usage_recorder(user, route):
+    # Speculative prefetches never use up quota that live users need
+    count_toward_quota = user != PREFETCH_USER
+    return lambda usage: usage_tracker.record(user, SERVING_ENDPOINT, route, usage, count_toward_quota=count_toward_quota)
+
+# Answers produced by query_endpoint's fallback paths must never be cached
+UNCACHEABLE_PREFIXES = (
+    "I'm sorry, I couldn't generate a response",
+    "I encountered an issue while processing your request",
+    "I am processing your request",
+    "I received your request but couldn't process the response",
+)
+
+# --- Response cache and speculative prefetch ---
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900")),
+)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+# Endpoint and route token totals are operational data, so exposing them is opt-in
+USAGE_TOTALS_ENABLED = os.getenv("USAGE_TOTALS_ENABLED", "false").lower() == "true"
+
+# Caching live answers shares them across users, so it is opt-in; prefetched answers
+# are served from the cache whenever prefetch is on
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+
+def extract_assistant_message(response_messages):
+    """Pull the assistant's text out of a query_endpoint result"""
+    if isinstance(response_messages, list):
+        for msg in response_messages:
+            if isinstance(msg, dict) and msg.get("role") == "assistant" and msg.get("content"):
+                return msg["content"]
+            elif isinstance(msg, dict) and "content" in msg:
+                # Handle case where role might not be present
+                return msg["content"]
+    elif isinstance(response_messages, dict):
+        # Handle single message response
+        if response_messages.get("content"):
+            return response_messages["content"]
+        elif response_messages.get("message"):
+            return response_messages["message"]
+    return ""
+
+def is_cacheable(assistant_message):
+    return bool(assistant_message) and not assistant_message.startswith(UNCACHEABLE_PREFIXES)
+
+def run_prefetch_query(prompt):
+    """Query the endpoint for a speculative prompt; runs in a worker thread"""
+    # Generated with the chat route's parameters, since the answer is served to /api/chat
+    max_tokens, extra_inputs = split_params(generation_policy.resolve("chat", prompt, PREFETCH_USER))
+    # Prefetch is not a user, so only the endpoint quota applies; speculate only when the
+    # full budget fits, so cached answers are never cut short
+    remaining = usage_tracker.remaining(None, SERVING_ENDPOINT)
+    if remaining is not None and remaining < max_tokens:
+        return None
+    response_messages, request_id = query_endpoint(
+        endpoint_name=SERVING_ENDPOINT,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=max_tokens,
+        return_traces=False,
+        extra_inputs=extra_inputs,
+        on_usage=usage_recorder(PREFETCH_USER, "prefetch")
+    )
+    assistant_message = extract_assistant_message(response_messages)
+    if not is_cacheable(assistant_message):
+        return None
+    return assistant_message, request_id
+
+# Mock data - replace with real data from your Databricks workspace
+DASHBOARD_DATA = {
+    "collections": [
+        {"month": "Jan", "value": 1200},
+        {"month": "Feb", "value": 1350},
+        {"month": "Mar", "value": 1100},
+        {"month": "Apr", "value": 1400},
+        {"month": "May", "value": 1600},
+        {"month": "Jun", "value": 1800}
+    ],
+    "revenue": [
+        {"month": "Jan", "value": 45000},
+        {"month": "Feb", "value": 52000},
+        {"month": "Mar", "value": 48000},
+        {"month": "Apr", "value": 55000},
+        {"month": "May", "value": 62000},
+        {"month": "Jun", "value": 68000}
+    ],
+    "metrics": {
+        "total_collections": "2,847",
+        "active_customers": "1,234",
+        "monthly_revenue": "$68,000",
+        "efficiency_score": "94.2%"
+    }
+}
+
+prefetcher = Prefetcher(
+    cache=response_cache,
+    endpoint=SERVING_ENDPOINT,
+    run_query=run_prefetch_query,
+    history_provider=lambda: chat_history,
+    max_per_hour=int(os.getenv("PREFETCH_MAX_PER_HOUR", "30")),
+    idle_seconds=float(os.getenv("PREFETCH_IDLE_SECONDS", "30")),
+    interval_seconds=float(os.getenv("PREFETCH_INTERVAL_SECONDS", "10")),
+    templates=json.loads(os.environ["PREFETCH_PROMPTS"]) if os.getenv("PREFETCH_PROMPTS") else None,
+    cache_params=lambda prompt: generation_params("chat", prompt, PREFETCH_USER),
+    # Seeded with the dashboard the frontends show, since nothing may ever call /api/dashboard-data
+    dashboard_data=DASHBOARD_DATA,
+)
+
+# Readiness is probed in the background with a metadata call and fed by live traffic,
+# so health routes only read a cached snapshot
+health_monitor = HealthMonitor(
+    endpoint=SERVING_ENDPOINT,
+    probe=get_endpoint_state,
+    interval_seconds=float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "30")),
+    probe_latency_threshold_ms=float(os.getenv("HEALTH_PROBE_LATENCY_THRESHOLD_MS", "2000")),
+    latency_threshold_ms=float(os.getenv("HEALTH_LATENCY_THRESHOLD_MS", "30000")),
+    error_rate_threshold=float(os.getenv("HEALTH_ERROR_RATE_THRESHOLD", "0.25")),
+    window_size=int(os.getenv("HEALTH_WINDOW", "50")),
+    window_seconds=float(os.getenv("HEALTH_WINDOW_SECONDS", "300")),
+)
+add_call_observer(health_monitor.record_call)
+
+# Map readiness statuses onto the legacy /api/health status values
+HEALTH_STATUS = {"ready": "healthy", "degraded": "degraded", "not_ready": "unhealthy", "unknown": "starting"}
 
 # --- API Routes ---
 @app.get("/")
@@ -92,29 +341,47 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
-    """Health check endpoint"""
-    logger.info("Health check at /api/health")
+    """Health check endpoint, summarizing the cached readiness snapshot"""
+    snapshot = health_monitor.snapshot()
     return HealthResponse(
-        status="healthy",
+        status=HEALTH_STATUS.get(snapshot["status"], snapshot["status"]),
         timestamp=datetime.now().isoformat(),
         serving_endpoint=SERVING_ENDPOINT,
-        endpoint_supports_feedback=ENDPOINT_SUPPORTS_FEEDBACK
+        endpoint_supports_feedback=ENDPOINT_SUPPORTS_FEEDBACK,
+        reasons=snapshot["reasons"]
     )
 
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness: the process is up and serving requests; never calls the endpoint"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Readiness: the cached endpoint snapshot; 503 until the endpoint can take traffic"""
+    snapshot = health_monitor.snapshot()
+    status_code = 503 if snapshot["status"] in ("not_ready", "unknown") else 200
+    return Response(content=json.dumps(snapshot), media_type="application/json", status_code=status_code)
+
 @app.get("/api/test-endpoint")
-async def test_endpoint():
+async def test_endpoint(request: Request):
     """Test endpoint connectivity"""
     try:
         logger.info(f"Testing endpoint connectivity: {SERVING_ENDPOINT}")
         
         # Test with a simple message
         test_messages = [{"role": "user", "content": "Hello, this is a test message."}]
+        user = request_user(request)
+        max_tokens, extra_inputs = resolve_generation("test-endpoint", None, user)
         
-        response_messages, request_id = query_endpoint(
+        response_messages, request_id = await run_in_threadpool(
+            query_endpoint,
             endpoint_name=SERVING_ENDPOINT,
             messages=test_messages,
-            max_tokens=100,
-            return_traces=False
+            max_tokens=max_tokens,
+            return_traces=False,
+            extra_inputs=extra_inputs,
+            on_usage=usage_recorder(user, "test-endpoint")
         )
         
         return {
@@ -135,8 +402,10 @@ async def test_endpoint():
         }
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(message: ChatMessage):
+async def chat(message: ChatMessage, request: Request):
     """Send a message to the AI chatbot"""
+    mark_admitted()
+    user = request_user(request)
     try:
         logger.info(f"Received chat message: {message.message[:100]}...")
         
@@ -146,82 +415,118 @@ async def chat(message: ChatMessage):
             "content": message.message
         }]
         
-        logger.info(f"Querying endpoint: {SERVING_ENDPOINT}")
-        
-        # Query the Databricks model serving endpoint with increased max_tokens
-        response_messages, request_id = query_endpoint(
-            endpoint_name=SERVING_ENDPOINT,
-            messages=input_messages,
-            max_tokens=2000,  # Increased from 400 to 2000
-            return_traces=ENDPOINT_SUPPORTS_FEEDBACK
-        )
-        
-        logger.info(f"Received response from endpoint, request_id: {request_id}")
-        logger.info(f"Response length: {len(str(response_messages))} characters")
-        
-        # Extract the assistant's response
-        assistant_message = ""
-        
-        # Handle different response formats
-        if isinstance(response_messages, list):
-            for msg in response_messages:
-                if isinstance(msg, dict) and msg.get("role") == "assistant" and msg.get("content"):
-                    assistant_message = msg["content"]
-                    break
-                elif isinstance(msg, dict) and "content" in msg:
-                    # Handle case where role might not be present
-                    assistant_message = msg["content"]
-                    break
-        elif isinstance(response_messages, dict):
-            # Handle single message response
-            if response_messages.get("content"):
-                assistant_message = response_messages["content"]
-            elif response_messages.get("message"):
-                assistant_message = response_messages["message"]
+        # Answers are only shared between requests the policy gives the same budget and inputs
+        params = generation_params("chat", message.message, user)
+        cache_key = response_cache.make_key(SERVING_ENDPOINT, message.message, params)
+        cached = response_cache.get(cache_key) if RESPONSE_CACHE_ENABLED or PREFETCH_ENABLED else None
+        if cached:
+            logger.info(f"Serving cached response (source: {cached['source']})")
+            assistant_message = cached["message"]
+            # The original request_id belongs to whoever caused the answer, so feedback can't target it
+            request_id = None
+        else:
+            logger.info(f"Querying endpoint: {SERVING_ENDPOINT}")
+            
+            # Budget the request by route, prompt class and user rather than a fixed maximum
+            max_tokens, extra_inputs = resolve_generation("chat", message.message, user)
+            logger.info(f"Token budget for {user}: {max_tokens}")
+            
+            # Query the Databricks model serving endpoint in a worker thread so the event loop
+            # (and with it the health routes) stays responsive during long generations
+            prefetcher.live_request_started()
+            try:
+                response_messages, request_id = await run_in_threadpool(
+                    query_endpoint,
+                    endpoint_name=SERVING_ENDPOINT,
+                    messages=input_messages,
+                    max_tokens=max_tokens,
+                    return_traces=ENDPOINT_SUPPORTS_FEEDBACK,
+                    extra_inputs=extra_inputs,
+                    on_usage=usage_recorder(user, "chat")
+                )
+            finally:
+                prefetcher.live_request_finished()
+            
+            logger.info(f"Received response from endpoint, request_id: {request_id}")
+            
+            # Extract the assistant's response
+            with span("parse"):
+                assistant_message = extract_assistant_message(response_messages)
+            if not assistant_message:
+                logger.warning(f"Response structure: {type(response_messages)} - {response_messages}")
+            elif (RESPONSE_CACHE_ENABLED and is_cacheable(assistant_message)
+                  and not blob_store.should_spill(assistant_message)
+                  # An answer cut short by the caller's remaining quota is not shared
+                  and max_tokens >= params["max_output_tokens"]):
+                response_cache.put(cache_key, assistant_message, request_id)
+            # The extracted answer is the only copy we need from here on
+            del response_messages
         
         if not assistant_message:
             logger.warning("No assistant message found in response")
-            logger.warning(f"Response structure: {type(response_messages)} - {response_messages}")
             assistant_message = "I'm sorry, I couldn't generate a response. Please try again."
         
         # Log response size for debugging
         logger.info(f"Assistant message length: {len(assistant_message)} characters")
+        logger.info(f"Generated response: {assistant_message[:100]}...")
+        timestamp = datetime.now().isoformat()
         
-        # Create response
-        response = ChatResponse(
-            message=assistant_message,
-            timestamp=datetime.now().isoformat(),
-            request_id=request_id
-        )
-        
-        # Store in chat history
-        chat_history.append({
-            "user_message": message.message,
-            "assistant_message": response.message,
-            "timestamp": response.timestamp,
-            "request_id": response.request_id
-        })
+        # Very large answers are spilled to disk and referenced from history by blob id,
+        # then streamed back from the blob so no full in-memory copy outlives this point
+        if blob_store.should_spill(assistant_message):
+            logger.info("Response exceeds spill threshold, storing as blob")
+            with span("history"):
+                blob_id = blob_store.put(assistant_message)
+                append_chat_history({
+                    "user_message": message.message,
+                    "assistant_message": None,
+                    "assistant_blob": blob_id,
+                    "assistant_message_length": len(assistant_message),
+                    "timestamp": timestamp,
+                    "request_id": request_id
+                })
+            del assistant_message
+            return StreamingResponse(
+                iter_json_message(blob_store.iter_chunks(blob_id), timestamp, request_id),
+                media_type="application/json"
+            )
         
-        # Keep only last 100 messages
-        if len(chat_history) > 100:
-            chat_history.pop(0)
+        # Store in chat history; the entry shares the answer string with the response
+        with span("history"):
+            append_chat_history({
+                "user_message": message.message,
+                "assistant_message": assistant_message,
+                "timestamp": timestamp,
+                "request_id": request_id
+            })
         
-        logger.info(f"Generated response: {response.message[:100]}...")
+        # If response is very large, stream it in chunks instead of building one JSON string
+        # Pre-render markdown once so clients don't have to parse it; the large answers
+        # below are the ones that benefit most
+        with span("render"):
+            html = render_markdown_cached(assistant_message)
         
-        # If response is very large, use streaming
-        if len(assistant_message) > 10000:  # 10KB threshold
+        if len(assistant_message) > STREAMING_THRESHOLD_CHARS:
             logger.info("Response is large, using streaming")
             return StreamingResponse(
-                iter([json.dumps({
-                    "message": assistant_message,
-                    "timestamp": datetime.now().isoformat(),
-                    "request_id": request_id
-                })]),
+                iter_json_message(iter_text_chunks(assistant_message), timestamp, request_id, html=html),
                 media_type="application/json"
             )
         
-        return response
+        # Serialize here rather than in FastAPI so the cost shows up as its own span
+        with span("serialization"):
+            body = json.dumps(jsonable_encoder(ChatResponse(
+                message=assistant_message,
+                timestamp=timestamp,
+                request_id=request_id,
+                html=html,
+                cached=bool(cached)
+            )))
+        return Response(content=body, media_type="application/json")
         
+    except QuotaExceeded as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
         logger.error(f"Error type: {type(e).__name__}")
@@ -235,14 +540,61 @@ async def get_chat_history():
     logger.info("Chat history requested")
     return {"history": chat_history}
 
+@app.get("/api/chat/blobs/{blob_id}")
+async def get_chat_blob(blob_id: str):
+    """Stream a large assistant answer referenced from chat history"""
+    if not blob_store.exists(blob_id):
+        raise HTTPException(status_code=404, detail="Blob not found")
+    return StreamingResponse(blob_store.iter_chunks(blob_id), media_type="text/markdown; charset=utf-8")
+
 @app.delete("/api/chat/history")
 async def clear_chat_history():
     """Clear chat history"""
     global chat_history
+    # Only delete blobs this history references; BLOB_DIR may hold other files
+    blob_ids = {entry["assistant_blob"] for entry in chat_history if entry.get("assistant_blob")}
     chat_history = []
+    for blob_id in blob_ids:
+        blob_store.delete(blob_id)
     logger.info("Chat history cleared")
     return {"message": "Chat history cleared"}
 
+@app.get("/api/usage")
+async def get_usage(request: Request):
+    """Get the caller's own token usage and remaining quota"""
+    user = request_user(request)
+    return {
+        "user": user,
+        "user_usage": usage_tracker.user_totals(user),
+        "remaining": usage_tracker.remaining(user, SERVING_ENDPOINT)
+    }
+
+@app.get("/api/usage/totals")
+async def get_usage_totals():
+    """Get token usage totals per endpoint and route (no per-user figures); enabled by USAGE_TOTALS_ENABLED"""
+    if not USAGE_TOTALS_ENABLED:
+        raise HTTPException(status_code=404, detail="Usage totals are not enabled")
+    return usage_tracker.totals()
+
+@app.get("/api/profiles")
+async def get_profiles():
+    """List saved profiler captures for the slowest sampled requests"""
+    return {
+        "sample_rate": slow_request_profiler.sample_rate,
+        "keep_slowest": slow_request_profiler.keep_slowest,
+        "captures": slow_request_profiler.captures()
+    }
+
+@app.get("/api/prefetch/status")
+async def get_prefetch_status():
+    """Get response cache and speculative prefetch statistics"""
+    return {
+        "enabled": PREFETCH_ENABLED,
+        "response_cache_enabled": RESPONSE_CACHE_ENABLED,
+        "prefetch": prefetcher.stats(),
+        "cache": response_cache.stats()
+    }
+
 @app.post("/api/feedback")
 async def submit_chat_feedback(request_id: str, rating: int):
     """Submit feedback for a chat response"""
@@ -250,7 +602,8 @@ async def submit_chat_feedback(request_id: str, rating: int):
         if not ENDPOINT_SUPPORTS_FEEDBACK:
             raise HTTPException(status_code=400, detail="Feedback not supported by this endpoint")
         
-        submit_feedback(
+        await run_in_threadpool(
+            submit_feedback,
             endpoint=SERVING_ENDPOINT,
             request_id=request_id,
             rating=rating
@@ -268,33 +621,9 @@ async def get_dashboard_data():
     """Get dashboard data for charts and metrics"""
     logger.info("Dashboard data requested")
     
-    # Mock data - replace with real data from your Databricks workspace
-    data = {
-        "collections": [
-            {"month": "Jan", "value": 1200},
-            {"month": "Feb", "value": 1350},
-            {"month": "Mar", "value": 1100},
-            {"month": "Apr", "value": 1400},
-            {"month": "May", "value": 1600},
-            {"month": "Jun", "value": 1800}
-        ],
-        "revenue": [
-            {"month": "Jan", "value": 45000},
-            {"month": "Feb", "value": 52000},
-            {"month": "Mar", "value": 48000},
-            {"month": "Apr", "value": 55000},
-            {"month": "May", "value": 62000},
-            {"month": "Jun", "value": 68000}
-        ],
-        "metrics": {
-            "total_collections": "2,847",
-            "active_customers": "1,234",
-            "monthly_revenue": "$68,000",
-            "efficiency_score": "94.2%"
-        }
-    }
-    
-    return data
+    # The current view drives which follow-up questions get prefetched
+    prefetcher.observe_dashboard(DASHBOARD_DATA)
+    return DASHBOARD_DATA
 
 # --- Static Files Setup ---
 static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
@@ -0,0 +1,208 @@
+"""
+Speculative prefetch of likely follow-up questions.
+
+Dashboard users mostly ask about the metrics they are looking at, so while the
+app is idle we run a small set of candidate prompts (built from the current
+dashboard view and recent chat history) against the serving endpoint and
+store the answers in the response cache. Speculation is strictly budgeted: it
+only runs when no live /api/chat request is in flight, after a quiet period,
+one request at a time, and under an hourly cap.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROMPT_TEMPLATES = [
+    "What is driving the collections trend from {first_month} to {last_month}?",
+    "Why is monthly revenue at {monthly_revenue}?",
+    "How can we improve the efficiency score of {efficiency_score}?",
+    "Summarize total collections of {total_collections} across {active_customers} active customers.",
+]
+
+
+def build_candidate_prompts(dashboard_data, history, templates=None, history_limit=5):
+    """Return de-duplicated candidate prompts, dashboard-derived first."""
+    prompts = []
+    if dashboard_data:
+        metrics = dict(dashboard_data.get("metrics", {}))
+        months = [point["month"] for point in dashboard_data.get("collections", [])]
+        if months:
+            metrics.setdefault("first_month", months[0])
+            metrics.setdefault("last_month", months[-1])
+        for template in templates or DEFAULT_PROMPT_TEMPLATES:
+            try:
+                prompts.append(template.format(**metrics))
+            except (KeyError, IndexError):
+                # Template references a metric the current view doesn't have
+                continue
+
+    # Questions asked more than once recently are likely to be asked again
+    counts = {}
+    for item in reversed(history or []):
+        prompt = item.get("user_message")
+        if prompt:
+            counts[prompt] = counts.get(prompt, 0) + 1
+    repeated = [prompt for prompt, count in counts.items() if count > 1]
+    prompts.extend(repeated[:history_limit])
+
+    seen = set()
+    unique = []
+    for prompt in prompts:
+        if prompt not in seen:
+            seen.add(prompt)
+            unique.append(prompt)
+    return unique
+
+
+class PrefetchBudget:
+    """Caps speculative requests per rolling hour."""
+
+    def __init__(self, max_per_hour):
+        self.max_per_hour = max_per_hour
+        self._spent = deque()
+
+    def _trim(self, now):
+        while self._spent and now - self._spent[0] > 3600:
+            self._spent.popleft()
+
+    def remaining(self):
+        self._trim(time.time())
+        return max(self.max_per_hour - len(self._spent), 0)
+
+    def try_spend(self):
+        now = time.time()
+        self._trim(now)
+        if len(self._spent) >= self.max_per_hour:
+            return False
+        self._spent.append(now)
+        return True
+
+
+class Prefetcher:
+    """
+    Background task that warms the response cache during idle capacity.
+
+    ``run_query(prompt)`` must return ``(message, request_id)`` or ``None`` when
+    the answer should not be cached; it is run in a worker thread.
+    ``cache_params(prompt)`` returns the generation parameters that go into the
+    cache key, so entries match the live requests they are meant for.
+    """
+
+    def __init__(self, cache, endpoint, run_query, history_provider,
+                 max_per_hour=30, idle_seconds=30, interval_seconds=10, templates=None,
+                 cache_params=None, dashboard_data=None):
+        self.cache = cache
+        self.endpoint = endpoint
+        self.run_query = run_query
+        self.cache_params = cache_params or (lambda prompt: None)
+        self.history_provider = history_provider
+        self.budget = PrefetchBudget(max_per_hour)
+        self.idle_seconds = idle_seconds
+        self.interval_seconds = interval_seconds
+        self.templates = templates
+        self._dashboard_data = dashboard_data
+        self._live_in_flight = 0
+        self._last_live_activity = 0.0
+        self._attempted = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self.completed = 0
+        self.failed = 0
+
+    def observe_dashboard(self, data):
+        """Record the dashboard view the user is currently looking at."""
+        self._dashboard_data = data
+
+    def live_request_started(self):
+        with self._lock:
+            self._live_in_flight += 1
+            self._last_live_activity = time.time()
+
+    def live_request_finished(self):
+        with self._lock:
+            self._live_in_flight -= 1
+            self._last_live_activity = time.time()
+
+    def is_idle(self):
+        with self._lock:
+            return (self._live_in_flight == 0
+                    and time.time() - self._last_live_activity >= self.idle_seconds)
+
+    def next_prompt(self):
+        """Pick the first candidate that is neither cached nor recently attempted."""
+        now = time.time()
+        candidates = build_candidate_prompts(self._dashboard_data, self.history_provider(), self.templates)
+        for prompt in candidates:
+            if self.cache.contains(self.cache.make_key(self.endpoint, prompt, self.cache_params(prompt))):
+                continue
+            if now - self._attempted.get(prompt, 0) < self.cache.ttl_seconds:
+                continue
+            return prompt
+        return None
+
+    async def run_once(self):
+        """Run at most one speculative request; returns the prompt run, if any."""
+        if not self.is_idle():
+            return None
+        prompt = self.next_prompt()
+        if prompt is None or not self.budget.try_spend():
+            return None
+
+        now = time.time()
+        # Attempts older than the cache TTL no longer block a retry, so forget them
+        self._attempted = {p: t for p, t in self._attempted.items() if now - t < self.cache.ttl_seconds}
+        self._attempted[prompt] = now
+        logger.info(f"Prefetching: {prompt[:100]}")
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(None, self.run_query, prompt)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Prefetch failed: {e}")
+            return prompt
+
+        if result is None:
+            self.failed += 1
+            return prompt
+        message, request_id = result
+        key = self.cache.make_key(self.endpoint, prompt, self.cache_params(prompt))
+        self.cache.put(key, message, request_id, source="prefetch")
+        self.completed += 1
+        return prompt
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Prefetch loop error: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "running": self._task is not None,
+            "completed": self.completed,
+            "failed": self.failed,
+            "budget_remaining": self.budget.remaining(),
+            "max_per_hour": self.budget.max_per_hour,
+            "live_in_flight": self._live_in_flight,
+            "candidates": len(build_candidate_prompts(
+                self._dashboard_data, self.history_provider(), self.templates)),
+        }
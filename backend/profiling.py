@@ -0,0 +1,103 @@
+"""
+Sampled profiler captures for the slowest API requests.
+
+A fraction of instrumented requests run under a profiler. When a sampled
+request finishes, its capture is kept on disk only if it is among the slowest
+N seen so far; faster captures are evicted. pyinstrument is used when
+installed (HTML output, async-aware), otherwise cProfile (.prof output).
+"""
+import cProfile
+import heapq
+import logging
+import os
+import random
+import threading
+import time
+
+try:
+    from pyinstrument import Profiler as _PyinstrumentProfiler
+except ImportError:
+    _PyinstrumentProfiler = None
+
+logger = logging.getLogger(__name__)
+
+
+class SlowRequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, keep_slowest=10):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep_slowest = keep_slowest
+        # Min-heap of (duration_ms, path) so the fastest kept capture is evicted first
+        self._kept = []
+        self._active = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start a profiler for this request if it is sampled; returns it or None."""
+        if self.keep_slowest <= 0 or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        with self._lock:
+            # Only one profiler can be attached to the interpreter at a time
+            if self._active:
+                return None
+            self._active = True
+        if _PyinstrumentProfiler is not None:
+            profiler = _PyinstrumentProfiler(async_mode="enabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def stop(self, profiler):
+        """Stop the profiler; must run on the thread that started it."""
+        try:
+            if isinstance(profiler, cProfile.Profile):
+                profiler.disable()
+            else:
+                profiler.stop()
+        finally:
+            with self._lock:
+                self._active = False
+
+    def save(self, profiler, path, duration_ms):
+        """
+        Keep a stopped profiler's capture if the request is among the slowest.
+        Writes to disk, so callers on the event loop should run it in a thread.
+        """
+        is_cprofile = isinstance(profiler, cProfile.Profile)
+        with self._lock:
+            if self.keep_slowest <= 0:
+                return None
+            if len(self._kept) >= self.keep_slowest and duration_ms <= self._kept[0][0]:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            slug = path.strip("/").replace("/", "_") or "root"
+            extension = "prof" if is_cprofile else "html"
+            filename = os.path.join(
+                self.directory, f"{int(duration_ms)}ms-{slug}-{int(time.time() * 1000)}.{extension}"
+            )
+            if is_cprofile:
+                profiler.dump_stats(filename)
+            else:
+                with open(filename, "w", encoding="utf-8") as f:
+                    f.write(profiler.output_html())
+
+            heapq.heappush(self._kept, (duration_ms, filename))
+            if len(self._kept) > self.keep_slowest:
+                _, evicted = heapq.heappop(self._kept)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+        logger.info(f"Saved profile for {path} ({duration_ms:.1f}ms) to {filename}")
+        return filename
+
+    def captures(self):
+        """List kept captures by file name, slowest first; directory paths are not exposed."""
+        with self._lock:
+            return [
+                {"duration_ms": duration, "file": os.path.basename(path)}
+                for duration, path in sorted(self._kept, reverse=True)
+            ]
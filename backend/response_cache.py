@@ -0,0 +1,77 @@
+"""
+In-memory response cache for assistant answers.
+
+Keyed by serving endpoint, a normalized prompt and the generation parameters
+the answer was produced with, bounded in size (LRU) and
+age (TTL). Entries can come from live /api/chat traffic or from the prefetch
+subsystem; the source is kept so hit rates can be reported separately.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    def __init__(self, max_entries=256, ttl_seconds=900):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = {"live": 0, "prefetch": 0}
+        self.misses = 0
+
+    @staticmethod
+    def make_key(endpoint, prompt, params=None):
+        """
+        Build a cache key; prompts differing only in case/whitespace share an entry.
+        params (e.g. max_output_tokens) keep answers generated under different budgets apart.
+        """
+        return (endpoint, " ".join(prompt.lower().split()), json.dumps(params or {}, sort_keys=True))
+
+    def get(self, key):
+        """Return the cached entry for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() - entry["stored_at"] > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits[entry["source"]] = self.hits.get(entry["source"], 0) + 1
+            return entry
+
+    def contains(self, key):
+        """Check for a fresh entry without touching LRU order or hit counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() - entry["stored_at"] <= self.ttl_seconds
+
+    def put(self, key, message, request_id=None, source="live"):
+        with self._lock:
+            self._entries[key] = {
+                "message": message,
+                "request_id": request_id,
+                "source": source,
+                "stored_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": dict(self.hits),
+                "misses": self.misses,
+            }
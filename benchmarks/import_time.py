@@ -0,0 +1,112 @@
+"""
+Import-time benchmark for the app entry points.
+
+Runs each target in a fresh interpreter under ``python -X importtime`` and
+reports the total import cost plus the heaviest top-level modules, so startup
+regressions (e.g. an eager mlflow import creeping back in) are easy to spot.
+
+Targets:
+    model_serving_utils  shared serving helpers
+    backend.main         FastAPI entry point (uvicorn backend.main:app)
+    streamlit_app        the top-level imports of streamlit_app.py
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --max-ms backend.main=1500 --max-ms model_serving_utils=100
+    python benchmarks/import_time.py --json
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _streamlit_app_imports():
+    """Import statements at the top level of streamlit_app.py, without running the app."""
+    with open(os.path.join(REPO_ROOT, "streamlit_app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    lines = [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(lines)
+
+
+TARGETS = {
+    "model_serving_utils": lambda: "import model_serving_utils",
+    "backend.main": lambda: "import backend.main",
+    "streamlit_app": _streamlit_app_imports,
+}
+
+
+def measure(code):
+    """Run code under -X importtime; return (total_us, [(cumulative_us, module)] for top-level imports)."""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    top_level = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:   self [us] |  cumulative | imported package"
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented by two extra spaces per level
+        if len(name) - len(name.lstrip(" ")) == 1:
+            top_level.append((int(cumulative), name.strip()))
+    return sum(us for us, _ in top_level), sorted(top_level, reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import time of the app entry points")
+    parser.add_argument("targets", nargs="*", help=f"Targets to measure (default: all of {', '.join(TARGETS)})")
+    parser.add_argument("--top", type=int, default=8, help="Number of heaviest modules to list per target")
+    parser.add_argument("--max-ms", action="append", default=[], metavar="TARGET=MS",
+                        help="Fail if TARGET takes longer than MS to import (repeatable)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args(argv)
+
+    budgets = {}
+    for item in args.max_ms:
+        target, _, ms = item.partition("=")
+        budgets[target] = float(ms)
+
+    results = {}
+    failures = []
+    for target in args.targets or list(TARGETS):
+        try:
+            total_us, modules = measure(TARGETS[target]())
+        except RuntimeError as e:
+            results[target] = {"error": str(e)}
+            failures.append(f"{target}: {e}")
+            continue
+        results[target] = {
+            "total_ms": round(total_us / 1000, 1),
+            "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for us, name in modules[:args.top]],
+        }
+        budget = budgets.get(target)
+        if budget is not None and total_us / 1000 > budget:
+            failures.append(f"{target}: {total_us / 1000:.1f}ms exceeds budget of {budget:.0f}ms")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for target, result in results.items():
+            if "error" in result:
+                print(f"{target}: ERROR {result['error']}")
+                continue
+            print(f"{target}: {result['total_ms']:.1f}ms")
+            for module in result["heaviest"]:
+                print(f"    {module['ms']:>9.1f}ms  {module['module']}")
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Memory benchmark for /api/chat with very large agent responses.
+
+For each response size, a fresh interpreter drives ``backend.main.chat`` with a
+stubbed endpoint returning an answer of that size, drains the streamed body,
+and reports:
+
+    peak      growth of peak RSS during the request, as a multiple of the answer size
+    retained  RSS still held after the request completes
+
+The answer has to exist in memory once when it arrives from the endpoint, so a
+bounded implementation shows a peak multiple that stays flat (~1x) and
+retained memory that does not grow with response size. ``--legacy`` runs the
+previous handler shape (str() of the response for logging, a Pydantic model,
+history copy and a full json.dumps) for comparison.
+
+Usage:
+    python benchmarks/response_memory.py
+    python benchmarks/response_memory.py --sizes-mb 1 8 32 --legacy
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MB = 1024 * 1024
+
+
+def _rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_one(size_bytes, legacy):
+    """Executed in the child interpreter; prints one JSON result line."""
+    import asyncio
+    import gc
+
+    sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("BLOB_DIR", tempfile.mkdtemp(prefix="blobs-"))
+    import backend.main as main
+    from model_serving_utils import parse_endpoint_response
+
+    def fake_query_endpoint(endpoint_name, messages, max_tokens, return_traces, **kwargs):
+        # Build the answer inside the call so it is freed with the request
+        return parse_endpoint_response({"output": "x" * size_bytes})
+
+    main.query_endpoint = fake_query_endpoint
+
+    async def legacy_chat(message):
+        response_messages, request_id = fake_query_endpoint(None, None, None, None)
+        _ = len(str(response_messages))
+        assistant_message = main.extract_assistant_message(response_messages)
+        response = main.ChatResponse(message=assistant_message, timestamp="t", request_id=request_id)
+        main.chat_history.append({"assistant_message": response.message})
+        return json.dumps({"message": assistant_message, "timestamp": "t", "request_id": request_id})
+
+    async def drive():
+        message = main.ChatMessage(message="benchmark")
+        if legacy:
+            body = await legacy_chat(message)
+            return len(body)
+        from starlette.requests import Request
+        response = await main.chat(message, Request({"type": "http", "headers": []}))
+        total = 0
+        if hasattr(response, "body_iterator"):
+            async for chunk in response.body_iterator:
+                total += len(chunk)
+        else:
+            total = len(response.body)
+        return total
+
+    gc.collect()
+    rss_before = _rss_bytes()
+    peak_before = max(_peak_rss_bytes(), rss_before)
+    body_len = asyncio.run(drive())
+    gc.collect()
+    print(json.dumps({
+        "size_bytes": size_bytes,
+        "body_bytes": body_len,
+        "peak_growth_bytes": max(_peak_rss_bytes() - peak_before, 0),
+        "retained_bytes": max(_rss_bytes() - rss_before, 0),
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure /api/chat memory use as response size grows")
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--legacy", action="store_true", help="Also measure the pre-streaming handler shape")
+    parser.add_argument("--child", nargs=2, metavar=("SIZE_BYTES", "LEGACY"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        _run_one(int(args.child[0]), args.child[1] == "1")
+        return 0
+
+    modes = [("current", "0")] + ([("legacy", "1")] if args.legacy else [])
+    print(f"{'mode':<8} {'size':>8} {'peak':>12} {'peak/size':>10} {'retained':>12}")
+    for mode, flag in modes:
+        for size_mb in args.sizes_mb:
+            size_bytes = int(size_mb * MB)
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", str(size_bytes), flag],
+                cwd=REPO_ROOT, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"{mode:<8} {size_mb:>6.0f}MB  ERROR {proc.stderr.strip().splitlines()[-1]}")
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{mode:<8} {size_mb:>6.0f}MB "
+                  f"{result['peak_growth_bytes'] / MB:>10.1f}MB "
+                  f"{result['peak_growth_bytes'] / size_bytes:>9.2f}x "
+                  f"{result['retained_bytes'] / MB:>10.1f}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,6 @@
-import React, { useState, useRef, useEffect } from 'react'
+import React, { useState, useRef, useEffect, useLayoutEffect, useCallback } from 'react'
+import { createPortal } from 'react-dom'
+import hljs from 'highlight.js/lib/common'
 import { Send, Bot, User, Loader2, RefreshCw, Sparkles, Copy, Check } from 'lucide-react'
 import ReactMarkdown from 'react-markdown'
 import remarkGfm from 'remark-gfm'
@@ -10,8 +12,219 @@ interface Message {
   role: 'user' | 'assistant'
   timestamp: string
   isError?: boolean
+  html?: string
 }
 
+// Number of messages rendered at once; earlier ones are revealed on demand
+const HISTORY_WINDOW_SIZE = 50
+
+const formatTime = (timestamp: string) => {
+  return new Date(timestamp).toLocaleTimeString([], { 
+    hour: '2-digit', 
+    minute: '2-digit' 
+  })
+}
+
+interface CodeBlock {
+  container: HTMLElement
+  code: string
+}
+
+// Give server-rendered HTML the highlighting and styling the ReactMarkdown `components`
+// overrides below provide; returns the elements that should get a copy button
+const decorateServerHtml = (root: HTMLElement): CodeBlock[] => {
+  const codeBlocks: CodeBlock[] = []
+  root.querySelectorAll('pre').forEach(pre => {
+    const code = pre.querySelector('code')
+    const match = /language-(\w+)/.exec(code?.className || '')
+    if (code && match && hljs.getLanguage(match[1])) {
+      hljs.highlightElement(code)
+    }
+    pre.className = 'bg-gray-800 text-gray-100 p-4 rounded-lg overflow-x-auto'
+    const wrapper = document.createElement('div')
+    wrapper.className = 'relative'
+    pre.parentNode?.insertBefore(wrapper, pre)
+    wrapper.appendChild(pre)
+    const container = document.createElement('div')
+    wrapper.appendChild(container)
+    codeBlocks.push({ container, code: (pre.textContent || '').replace(/\n$/, '') })
+  })
+  root.querySelectorAll(':not(pre) > code').forEach(code => {
+    code.className = 'bg-gray-200 text-gray-800 px-1 py-0.5 rounded text-sm'
+  })
+  root.querySelectorAll('table').forEach(table => {
+    const wrapper = document.createElement('div')
+    wrapper.className = 'overflow-x-auto'
+    table.parentNode?.insertBefore(wrapper, table)
+    wrapper.appendChild(table)
+    table.className = 'min-w-full divide-y divide-gray-200'
+  })
+  root.querySelectorAll('th').forEach(th => {
+    th.className = 'px-6 py-3 bg-gray-50 text-left text-xs font-medium text-gray-500 uppercase tracking-wider'
+  })
+  root.querySelectorAll('td').forEach(td => {
+    td.className = 'px-6 py-4 whitespace-nowrap text-sm text-gray-900 border-t border-gray-200'
+  })
+  return codeBlocks
+}
+
+interface ServerHtmlProps {
+  html: string
+  messageId: number
+  isCopied: boolean
+  onCopy: (content: string, messageId: number) => void
+}
+
+// Sanitized HTML pre-rendered by the backend; no client-side markdown parsing
+const ServerHtml = ({ html, messageId, isCopied, onCopy }: ServerHtmlProps) => {
+  const ref = useRef<HTMLDivElement>(null)
+  const decoratedHtml = useRef<string | null>(null)
+  const [codeBlocks, setCodeBlocks] = useState<CodeBlock[]>([])
+
+  useLayoutEffect(() => {
+    // React only resets innerHTML when html changes, so decorate once per html
+    if (!ref.current || decoratedHtml.current === html) return
+    decoratedHtml.current = html
+    setCodeBlocks(decorateServerHtml(ref.current))
+  }, [html])
+
+  return (
+    <>
+      <div
+        ref={ref}
+        className="prose prose-sm max-w-none"
+        dangerouslySetInnerHTML={{ __html: html }}
+      />
+      {codeBlocks.map((block, index) => createPortal(
+        <button
+          onClick={() => onCopy(block.code, messageId)}
+          className="absolute top-2 right-2 p-1 rounded bg-gray-800/50 text-white opacity-0 group-hover:opacity-100 transition-opacity"
+        >
+          {isCopied ? <Check className="w-3 h-3" /> : <Copy className="w-3 h-3" />}
+        </button>,
+        block.container,
+        String(index)
+      ))}
+    </>
+  )
+}
+
+interface MessageItemProps {
+  message: Message
+  isCopied: boolean
+  onCopy: (content: string, messageId: number) => void
+}
+
+// Memoized so typing in the input or appending a message doesn't re-render
+// (and re-parse markdown for) every message already on screen
+const MessageItem = React.memo(({ message, isCopied, onCopy }: MessageItemProps) => {
+  return (
+    <div
+      className={`flex ${message.role === 'user' ? 'justify-end' : 'justify-start'}`}
+    >
+      <div className={`flex items-start space-x-4 max-w-[85%] ${
+        message.role === 'user' ? 'flex-row-reverse space-x-reverse' : ''
+      }`}>
+        <div className={`w-10 h-10 rounded-xl flex items-center justify-center flex-shrink-0 ${
+          message.role === 'user' 
+            ? 'bg-gradient-to-r from-blue-500 to-purple-600 text-white' 
+            : 'bg-gradient-to-r from-gray-100 to-gray-200 text-gray-600'
+        }`}>
+          {message.role === 'user' ? (
+            <User className="w-5 h-5" />
+          ) : (
+            <Bot className="w-5 h-5" />
+          )}
+        </div>
+        <div className={`relative group ${
+          message.role === 'user' ? 'text-right' : 'text-left'
+        }`}>
+          <div className={`rounded-2xl px-6 py-4 ${
+            message.role === 'user'
+              ? 'bg-gradient-to-r from-blue-500 to-purple-600 text-white'
+              : message.isError
+              ? 'bg-red-50 text-red-800 border border-red-200'
+              : 'bg-gray-50 text-gray-900 border border-gray-200'
+          }`}>
+            {message.role === 'assistant' && message.html ? (
+              <ServerHtml
+                html={message.html}
+                messageId={message.id}
+                isCopied={isCopied}
+                onCopy={onCopy}
+              />
+            ) : message.role === 'assistant' ? (
+              <div className="prose prose-sm max-w-none">
+                <ReactMarkdown 
+                  remarkPlugins={[remarkGfm]}
+                  rehypePlugins={[rehypeHighlight]}
+                                                 components={{
+                     code({ node, className, children, ...props }: any) {
+                       const match = /language-(\w+)/.exec(className || '')
+                       const isInline = !match
+                       return !isInline ? (
+                        <div className="relative">
+                          <button
+                            onClick={() => onCopy(String(children).replace(/\n$/, ''), message.id)}
+                            className="absolute top-2 right-2 p-1 rounded bg-gray-800/50 text-white opacity-0 group-hover:opacity-100 transition-opacity"
+                          >
+                            {isCopied ? <Check className="w-3 h-3" /> : <Copy className="w-3 h-3" />}
+                          </button>
+                          <pre className="bg-gray-800 text-gray-100 p-4 rounded-lg overflow-x-auto">
+                            <code className={className} {...props}>
+                              {children}
+                            </code>
+                          </pre>
+                        </div>
+                      ) : (
+                        <code className="bg-gray-200 text-gray-800 px-1 py-0.5 rounded text-sm" {...props}>
+                          {children}
+                        </code>
+                      )
+                    },
+                    table({ children }) {
+                      return (
+                        <div className="overflow-x-auto">
+                          <table className="min-w-full divide-y divide-gray-200">
+                            {children}
+                          </table>
+                        </div>
+                      )
+                    },
+                    th({ children }) {
+                      return (
+                        <th className="px-6 py-3 bg-gray-50 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
+                          {children}
+                        </th>
+                      )
+                    },
+                    td({ children }) {
+                      return (
+                        <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900 border-t border-gray-200">
+                          {children}
+                        </td>
+                      )
+                    }
+                  }}
+                >
+                  {message.content}
+                </ReactMarkdown>
+              </div>
+            ) : (
+              <div className="whitespace-pre-wrap">{message.content}</div>
+            )}
+          </div>
+          <div className={`text-xs text-gray-500 mt-2 ${
+            message.role === 'user' ? 'text-right' : 'text-left'
+          }`}>
+            {formatTime(message.timestamp)}
+          </div>
+        </div>
+      </div>
+    </div>
+  )
+})
+
 const Chat: React.FC = () => {
   const [messages, setMessages] = useState<Message[]>(() => {
     const savedMessages = localStorage.getItem('chat-messages')
@@ -20,6 +233,7 @@ const Chat: React.FC = () => {
   const [inputMessage, setInputMessage] = useState('')
   const [isLoading, setIsLoading] = useState(false)
   const [copiedId, setCopiedId] = useState<number | null>(null)
+  const [visibleCount, setVisibleCount] = useState(HISTORY_WINDOW_SIZE)
   const messagesEndRef = useRef<HTMLDivElement>(null)
 
   const scrollToBottom = () => {
@@ -31,7 +245,8 @@ const Chat: React.FC = () => {
   }, [messages])
 
   useEffect(() => {
-    localStorage.setItem('chat-messages', JSON.stringify(messages))
+    // Rendered HTML is not persisted; reloaded messages fall back to client-side markdown
+    localStorage.setItem('chat-messages', JSON.stringify(messages.map(({ html, ...message }) => message)))
   }, [messages])
 
   const sendMessage = async (message: string) => {
@@ -108,7 +323,8 @@ const Chat: React.FC = () => {
         id: Date.now() + 1,
         content: response.message,
         role: 'assistant',
-        timestamp: new Date().toISOString()
+        timestamp: new Date().toISOString(),
+        html: response.html
       }
 
       console.log('Created assistant message:', assistantMessage)
@@ -139,10 +355,11 @@ const Chat: React.FC = () => {
 
   const clearChat = () => {
     setMessages([])
+    setVisibleCount(HISTORY_WINDOW_SIZE)
     localStorage.removeItem('chat-messages')
   }
 
-  const copyToClipboard = async (content: string, messageId: number) => {
+  const copyToClipboard = useCallback(async (content: string, messageId: number) => {
     try {
       await navigator.clipboard.writeText(content)
       setCopiedId(messageId)
@@ -150,14 +367,7 @@ const Chat: React.FC = () => {
     } catch (err) {
       console.error('Failed to copy text: ', err)
     }
-  }
-
-  const formatTime = (timestamp: string) => {
-    return new Date(timestamp).toLocaleTimeString([], { 
-      hour: '2-digit', 
-      minute: '2-digit' 
-    })
-  }
+  }, [])
 
   return (
     <div className="h-screen bg-gradient-to-br from-gray-50 via-blue-50 to-indigo-50">
@@ -211,105 +421,26 @@ const Chat: React.FC = () => {
                 </div>
               </div>
             ) : (
-              messages.map((message) => (
-                <div
-                  key={message.id}
-                  className={`flex ${message.role === 'user' ? 'justify-end' : 'justify-start'}`}
-                >
-                  <div className={`flex items-start space-x-4 max-w-[85%] ${
-                    message.role === 'user' ? 'flex-row-reverse space-x-reverse' : ''
-                  }`}>
-                    <div className={`w-10 h-10 rounded-xl flex items-center justify-center flex-shrink-0 ${
-                      message.role === 'user' 
-                        ? 'bg-gradient-to-r from-blue-500 to-purple-600 text-white' 
-                        : 'bg-gradient-to-r from-gray-100 to-gray-200 text-gray-600'
-                    }`}>
-                      {message.role === 'user' ? (
-                        <User className="w-5 h-5" />
-                      ) : (
-                        <Bot className="w-5 h-5" />
-                      )}
-                    </div>
-                    <div className={`relative group ${
-                      message.role === 'user' ? 'text-right' : 'text-left'
-                    }`}>
-                      <div className={`rounded-2xl px-6 py-4 ${
-                        message.role === 'user'
-                          ? 'bg-gradient-to-r from-blue-500 to-purple-600 text-white'
-                          : message.isError
-                          ? 'bg-red-50 text-red-800 border border-red-200'
-                          : 'bg-gray-50 text-gray-900 border border-gray-200'
-                      }`}>
-                        {message.role === 'assistant' ? (
-                          <div className="prose prose-sm max-w-none">
-                            <ReactMarkdown 
-                              remarkPlugins={[remarkGfm]}
-                              rehypePlugins={[rehypeHighlight]}
-                                                             components={{
-                                 code({ node, className, children, ...props }: any) {
-                                   const match = /language-(\w+)/.exec(className || '')
-                                   const isInline = !match
-                                   return !isInline ? (
-                                    <div className="relative">
-                                      <button
-                                        onClick={() => copyToClipboard(String(children).replace(/\n$/, ''), message.id)}
-                                        className="absolute top-2 right-2 p-1 rounded bg-gray-800/50 text-white opacity-0 group-hover:opacity-100 transition-opacity"
-                                      >
-                                        {copiedId === message.id ? <Check className="w-3 h-3" /> : <Copy className="w-3 h-3" />}
-                                      </button>
-                                      <pre className="bg-gray-800 text-gray-100 p-4 rounded-lg overflow-x-auto">
-                                        <code className={className} {...props}>
-                                          {children}
-                                        </code>
-                                      </pre>
-                                    </div>
-                                  ) : (
-                                    <code className="bg-gray-200 text-gray-800 px-1 py-0.5 rounded text-sm" {...props}>
-                                      {children}
-                                    </code>
-                                  )
-                                },
-                                table({ children }) {
-                                  return (
-                                    <div className="overflow-x-auto">
-                                      <table className="min-w-full divide-y divide-gray-200">
-                                        {children}
-                                      </table>
-                                    </div>
-                                  )
-                                },
-                                th({ children }) {
-                                  return (
-                                    <th className="px-6 py-3 bg-gray-50 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">
-                                      {children}
-                                    </th>
-                                  )
-                                },
-                                td({ children }) {
-                                  return (
-                                    <td className="px-6 py-4 whitespace-nowrap text-sm text-gray-900 border-t border-gray-200">
-                                      {children}
-                                    </td>
-                                  )
-                                }
-                              }}
-                            >
-                              {message.content}
-                            </ReactMarkdown>
-                          </div>
-                        ) : (
-                          <div className="whitespace-pre-wrap">{message.content}</div>
-                        )}
-                      </div>
-                      <div className={`text-xs text-gray-500 mt-2 ${
-                        message.role === 'user' ? 'text-right' : 'text-left'
-                      }`}>
-                        {formatTime(message.timestamp)}
-                      </div>
-                    </div>
+              <>
+                {messages.length > visibleCount && (
+                  <div className="text-center">
+                    <button
+                      onClick={() => setVisibleCount(count => count + HISTORY_WINDOW_SIZE)}
+                      className="px-4 py-2 text-sm text-gray-600 bg-white/80 rounded-xl border border-gray-200 hover:bg-white transition-all duration-200"
+                    >
+                      Show {Math.min(messages.length - visibleCount, HISTORY_WINDOW_SIZE)} earlier messages
+                    </button>
                   </div>
-                </div>
-              ))
+                )}
+                {messages.slice(-visibleCount).map((message) => (
+                  <MessageItem
+                    key={message.id}
+                    message={message}
+                    isCopied={copiedId === message.id}
+                    onCopy={copyToClipboard}
+                  />
+                ))}
+              </>
             )}
             
             {isLoading && (
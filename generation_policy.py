@@ -0,0 +1,116 @@
+"""
+Generation parameter policy.
+
+Chooses ``max_output_tokens`` (and any other endpoint inputs, e.g.
+``temperature``) per route, prompt class and user instead of paying for a fixed
+maximum budget on every question. Settings are layered, later layers winning:
+
+    defaults -> route -> prompt class (if the route classifies prompts) -> user
+
+and ``max_output_tokens`` is finally clamped to ``max_output_tokens_cap``.
+
+The built-in policy can be overridden with a JSON document in the
+``GENERATION_POLICY`` environment variable or a file named by
+``GENERATION_POLICY_FILE``; it is deep-merged over the defaults, e.g.::
+
+    {"prompt_classes": {"short": {"max_output_tokens": 512}},
+     "users": {"analyst@example.com": {"max_output_tokens": 4000}}}
+"""
+import copy
+import json
+import os
+import re
+
+DEFAULT_POLICY = {
+    "defaults": {"max_output_tokens": 2000},
+    "max_output_tokens_cap": 4000,
+    "routes": {
+        "chat": {"classify": True},
+        "streamlit": {"classify": True},
+        # Connectivity checks only need the endpoint to produce something
+        "test-endpoint": {"max_output_tokens": 16},
+    },
+    "prompt_classes": {
+        "short": {"max_output_tokens": 1024},
+        "standard": {"max_output_tokens": 2000},
+        "long_form": {"max_output_tokens": 3000},
+    },
+    "users": {},
+}
+
+# Phrases that signal the user wants an extended answer
+_LONG_FORM_PATTERN = re.compile(
+    r"\b(in detail|detailed|step[- ]by[- ]step|explain|report|compare|comparison|"
+    r"analy[sz]e|analysis|breakdown|walk me through|comprehensive|write)\b",
+    re.IGNORECASE,
+)
+SHORT_PROMPT_MAX_WORDS = 12
+LONG_PROMPT_MIN_CHARS = 400
+
+
+def classify_prompt(prompt):
+    """Classify a prompt as 'short', 'standard' or 'long_form'."""
+    text = (prompt or "").strip()
+    if len(text) >= LONG_PROMPT_MIN_CHARS or _LONG_FORM_PATTERN.search(text):
+        return "long_form"
+    if len(text.split()) <= SHORT_PROMPT_MAX_WORDS:
+        return "short"
+    return "standard"
+
+
+def _deep_merge(base, override):
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class GenerationPolicy:
+    def __init__(self, policy=None):
+        self.policy = _deep_merge(DEFAULT_POLICY, policy or {})
+
+    def resolve(self, route, prompt=None, user=None):
+        """
+        Return the endpoint inputs for a request as a dict that always contains
+        max_output_tokens, plus 'prompt_class' when the route classifies prompts.
+        """
+        route_settings = self.policy["routes"].get(route, {})
+        params = dict(self.policy["defaults"])
+        params.update({k: v for k, v in route_settings.items() if k != "classify"})
+
+        prompt_class = None
+        if route_settings.get("classify"):
+            prompt_class = classify_prompt(prompt)
+            params.update(self.policy["prompt_classes"].get(prompt_class, {}))
+
+        if user is not None:
+            params.update(self.policy["users"].get(user, {}))
+
+        params["max_output_tokens"] = min(
+            int(params["max_output_tokens"]), int(self.policy["max_output_tokens_cap"])
+        )
+        if prompt_class is not None:
+            params["prompt_class"] = prompt_class
+        return params
+
+
+def load_policy_from_env():
+    """Build a GenerationPolicy from GENERATION_POLICY / GENERATION_POLICY_FILE."""
+    override = {}
+    path = os.getenv("GENERATION_POLICY_FILE")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            override = json.load(f)
+    inline = os.getenv("GENERATION_POLICY")
+    if inline:
+        override = _deep_merge(override, json.loads(inline))
+    return GenerationPolicy(override)
+
+
+def split_params(params):
+    """Split resolved params into (max_tokens, extra_inputs) for query_endpoint."""
+    extra_inputs = {k: v for k, v in params.items() if k not in ("max_output_tokens", "prompt_class")}
+    return params["max_output_tokens"], extra_inputs
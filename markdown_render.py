@@ -0,0 +1,93 @@
+"""
+Server-side markdown rendering for assistant messages.
+
+Each message is rendered to sanitized HTML once and cached by content hash, so
+chat frontends can show long histories without re-parsing markdown on every
+render. Rendering uses Python-Markdown and sanitization uses nh3; when either
+is not installed, messages fall back to escaped plain text, which is always
+safe to inject.
+"""
+import hashlib
+import html
+import threading
+from collections import OrderedDict
+
+try:
+    import markdown as _markdown
+except ImportError:
+    _markdown = None
+
+try:
+    import nh3
+except ImportError:
+    nh3 = None
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+
+if nh3 is not None:
+    # Keep language-* classes on code blocks so the React client can syntax-highlight them
+    _ALLOWED_ATTRIBUTES = {tag: set(attrs) for tag, attrs in nh3.ALLOWED_ATTRIBUTES.items()}
+    _ALLOWED_ATTRIBUTES.setdefault("code", set()).add("class")
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def render_markdown(text):
+    """Render markdown to sanitized HTML (uncached)."""
+    if _markdown is None or nh3 is None:
+        return "<p>" + html.escape(text).replace("\n", "<br>") + "</p>"
+    rendered = _markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS, output_format="html")
+    return nh3.clean(rendered, attributes=_ALLOWED_ATTRIBUTES, link_rel="noopener noreferrer")
+
+
+class RenderCache:
+    """LRU cache of rendered HTML keyed by the markdown's content hash."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text):
+        key = content_hash(text)
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return rendered
+            self.misses += 1
+
+        # Render outside the lock; a concurrent duplicate render is harmless
+        rendered = render_markdown(text)
+        with self._lock:
+            self._entries[key] = rendered
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return rendered
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_render_cache = RenderCache()
+
+
+def render_markdown_cached(text):
+    """Render markdown to sanitized HTML, reusing the process-wide cache."""
+    return _render_cache.render(text)
+
+
+def render_cache_stats():
+    return _render_cache.stats()
@@ -1,8 +1,92 @@
-from mlflow.deployments import get_deploy_client
-from databricks.sdk import WorkspaceClient
 import json
+import reprlib
+import threading
+import time
 import uuid
 
+from request_timing import span
+from trace_recorder import get_trace_recorder
+
+# mlflow and databricks.sdk are imported on first use rather than at module load:
+# mlflow alone adds seconds to container cold start.
+_HEAVY_MODULES = ("mlflow.deployments", "databricks.sdk")
+_warm_up_thread = None
+_workspace_client = None
+_workspace_client_lock = threading.Lock()
+
+# Callbacks notified after every endpoint call with (endpoint_name, latency_ms, error)
+_call_observers = []
+
+
+def get_deploy_client(target="databricks"):
+    """Return an mlflow deployments client, importing mlflow on first use."""
+    from mlflow.deployments import get_deploy_client as _get_deploy_client
+    return _get_deploy_client(target)
+
+
+def get_workspace_client():
+    """
+    Return the process-wide Databricks WorkspaceClient, importing the SDK on first use.
+    The client is reused so config and auth (an OAuth token request under Databricks Apps)
+    are resolved once rather than on every health probe or feedback call.
+    """
+    global _workspace_client
+    if _workspace_client is None:
+        with _workspace_client_lock:
+            if _workspace_client is None:
+                from databricks.sdk import WorkspaceClient
+                _workspace_client = WorkspaceClient()
+    return _workspace_client
+
+
+def add_call_observer(callback):
+    """Register callback(endpoint_name, latency_ms, error) to be told about every query_endpoint call."""
+    _call_observers.append(callback)
+
+
+def _notify_call_observers(endpoint_name, latency_ms, error):
+    for callback in _call_observers:
+        try:
+            callback(endpoint_name, latency_ms, error)
+        except Exception as e:
+            print(f"ERROR: Call observer failed: {e}")
+
+
+def warm_up_imports(background=True):
+    """
+    Import the heavy serving dependencies ahead of the first request.
+    With background=True this runs once per process in a daemon thread and returns immediately.
+    """
+    global _warm_up_thread
+
+    def _import_all():
+        import importlib
+        for name in _HEAVY_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"WARNING: Warm-up import of {name} failed: {e}")
+
+    if not background:
+        _import_all()
+        return None
+    if _warm_up_thread is None:
+        _warm_up_thread = threading.Thread(target=_import_all, name="import-warm-up", daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
+
+
+# Debug logging of endpoint responses is bounded so multi-megabyte answers
+# aren't rendered into equally large strings just to be printed
+_debug_reprlib = reprlib.Repr()
+_debug_reprlib.maxstring = 500
+_debug_reprlib.maxother = 500
+_debug_reprlib.maxlist = 20
+_debug_reprlib.maxdict = 20
+_debug_reprlib.maxlevel = 4
+_debug_repr = _debug_reprlib.repr
+
+
 def _throw_unexpected_endpoint_format():
     raise Exception("This app can only run against:"
                     "1) Databricks foundation model or external model endpoints with the chat task type (described in https://docs.databricks.com/aws/en/machine-learning/model-serving/score-foundation-models#chat-completion-model-query)\n"
@@ -10,7 +94,7 @@ def _throw_unexpected_endpoint_format():
                     "in https://docs.databricks.com/aws/en/generative-ai/agent-framework/author-agent")
 
 
-def query_endpoint_stream(endpoint_name: str, messages: list[dict[str, str]], max_tokens: int, return_traces: bool):
+def query_endpoint_stream(endpoint_name: str, messages: list[dict[str, str]], max_tokens: int, return_traces: bool, extra_inputs: dict = None):
     """Streams chat-completions style chunks and converts to ChatAgent-style streaming deltas."""
     client = get_deploy_client("databricks")
 
@@ -26,6 +110,8 @@ def query_endpoint_stream(endpoint_name: str, messages: list[dict[str, str]], ma
         "input": [{"role": "user", "content": user_message}],
         "max_output_tokens": max_tokens,
     }
+    if extra_inputs:
+        inputs.update(extra_inputs)
     if return_traces:
         inputs["databricks_options"] = {"return_trace": True}
 
@@ -54,7 +140,7 @@ def query_endpoint_stream(endpoint_name: str, messages: list[dict[str, str]], ma
     except Exception as e:
         # Fallback to non-streaming if streaming fails
         print(f"Streaming failed, falling back to non-streaming: {e}")
-        response_messages, request_id = query_endpoint(endpoint_name, messages, max_tokens, return_traces)
+        response_messages, request_id = query_endpoint(endpoint_name, messages, max_tokens, return_traces, extra_inputs)
         if response_messages and len(response_messages) > 0:
             content = response_messages[0].get("content", "")
             if content:
@@ -67,10 +153,12 @@ def query_endpoint_stream(endpoint_name: str, messages: list[dict[str, str]], ma
                 }
 
 
-def query_endpoint(endpoint_name, messages, max_tokens, return_traces):
+def query_endpoint(endpoint_name, messages, max_tokens, return_traces, extra_inputs=None, on_usage=None):
     """
     Query an endpoint, returning the string message content and request ID for feedback.
     This function handles both foundation model endpoints and multi-agent supervisor endpoints.
+    extra_inputs are merged into the request payload (e.g. temperature), and on_usage, if given,
+    is called with the token usage reported in the response metadata.
     """
     client = get_deploy_client("databricks")
     
@@ -86,27 +174,94 @@ def query_endpoint(endpoint_name, messages, max_tokens, return_traces):
         "input": [{"role": "user", "content": user_message}],
         "max_output_tokens": max_tokens,
     }
+    if extra_inputs:
+        inputs.update(extra_inputs)
     
     if return_traces:
         inputs["databricks_options"] = {"return_trace": True}
     
+    started = time.perf_counter()
     try:
         print(f"DEBUG: Calling endpoint {endpoint_name} with inputs: {inputs}")
-        res = client.predict(endpoint=endpoint_name, inputs=inputs)
-        print(f"DEBUG: Received response from endpoint: {res}")
+        with span("upstream"):
+            res = client.predict(endpoint=endpoint_name, inputs=inputs)
+        latency_ms = (time.perf_counter() - started) * 1000
+        _notify_call_observers(endpoint_name, latency_ms, None)
+        print(f"DEBUG: Received response from endpoint: {_debug_repr(res)}")
         print(f"DEBUG: Response keys: {list(res.keys()) if isinstance(res, dict) else 'Not a dict'}")
         if isinstance(res, dict) and "output" in res:
-            print(f"DEBUG: Output content: {res['output']}")
+            print(f"DEBUG: Output content: {_debug_repr(res['output'])}")
             if isinstance(res["output"], list):
                 for i, item in enumerate(res["output"]):
-                    print(f"DEBUG: Output item {i}: {item}")
+                    print(f"DEBUG: Output item {i}: {_debug_repr(item)}")
     except Exception as e:
+        _notify_call_observers(endpoint_name, (time.perf_counter() - started) * 1000, e)
         print(f"ERROR: Error calling endpoint {endpoint_name}: {e}")
         print(f"ERROR: Error type: {type(e).__name__}")
         import traceback
         print(f"ERROR: Traceback: {traceback.format_exc()}")
         return [{"role": "assistant", "content": f"I encountered an issue while processing your request: {str(e)}. Please try again in a moment."}], None
     
+    if on_usage is not None:
+        usage = extract_usage(res)
+        if usage:
+            try:
+                on_usage(usage)
+            except Exception as e:
+                print(f"ERROR: Failed to record token usage: {e}")
+    
+    parsed = None
+    try:
+        with span("parse"):
+            parsed = parse_endpoint_response(res)
+        return parsed
+    finally:
+        _record_trace(endpoint_name, inputs, res, parsed, latency_ms)
+
+
+def extract_usage(res):
+    """
+    Read token usage from response metadata, normalized to input/output/total tokens.
+    Handles both Responses-style (input_tokens/output_tokens) and chat-completions-style
+    (prompt_tokens/completion_tokens) usage blocks; returns None when absent.
+    """
+    usage = res.get("usage") if isinstance(res, dict) else None
+    if not isinstance(usage, dict):
+        return None
+    input_tokens = usage.get("input_tokens", usage.get("prompt_tokens")) or 0
+    output_tokens = usage.get("output_tokens", usage.get("completion_tokens")) or 0
+    total_tokens = usage.get("total_tokens") or input_tokens + output_tokens
+    return {
+        "input_tokens": int(input_tokens),
+        "output_tokens": int(output_tokens),
+        "total_tokens": int(total_tokens),
+    }
+
+
+def _record_trace(endpoint_name, inputs, res, parsed, latency_ms):
+    """Queue the raw request/response pair for the trace recorder's writer thread, if one is configured."""
+    recorder = get_trace_recorder()
+    if recorder is None:
+        return
+    try:
+        response_messages, request_id = parsed if parsed else (None, None)
+        recorder.submit(
+            endpoint_name,
+            inputs,
+            res,
+            parsed=response_messages,
+            request_id=request_id,
+            latency_ms=latency_ms,
+        )
+    except Exception as e:
+        print(f"ERROR: Failed to record trace: {e}")
+
+
+def parse_endpoint_response(res):
+    """
+    Normalize a raw endpoint response into (messages, request_id).
+    Split out of query_endpoint so recorded responses can be replayed offline.
+    """
     # Extract request_id
     request_id = res.get("databricks_output", {}).get("databricks_request_id") if res else None
     
@@ -256,7 +411,7 @@ def submit_feedback(endpoint, request_id, rating):
             }
         ]
     }
-    w = WorkspaceClient()
+    w = get_workspace_client()
     return w.api_client.do(
         method='POST',
         path=f"/serving-endpoints/{endpoint}/served-models/feedback/invocations",
@@ -264,12 +419,31 @@ def submit_feedback(endpoint, request_id, rating):
     )
 
 
-def endpoint_supports_feedback(endpoint_name):
-    """Check if the endpoint supports feedback."""
+def endpoint_supports_feedback(endpoint_name, raise_errors=False):
+    """Check if the endpoint supports feedback. Errors return False unless raise_errors is set."""
     try:
-        w = WorkspaceClient()
+        w = get_workspace_client()
         endpoint = w.serving_endpoints.get(endpoint_name)
         return "feedback" in [entity.entity_name for entity in endpoint.config.served_entities]
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Error checking feedback support: {e}")
         return False
+
+
+def get_endpoint_state(endpoint_name):
+    """
+    Fetch the serving endpoint's state from the workspace API. This is a metadata call
+    and costs no tokens, unlike querying the endpoint.
+    """
+    w = get_workspace_client()
+    endpoint = w.serving_endpoints.get(endpoint_name)
+    state = endpoint.state
+    ready = getattr(state.ready, "value", state.ready) if state and state.ready else None
+    config_update = getattr(state.config_update, "value", state.config_update) if state and state.config_update else None
+    return {
+        "ready": ready == "READY",
+        "ready_state": ready,
+        "config_update": config_update,
+    }
@@ -0,0 +1,141 @@
+"""
+Replay recorded model serving traces offline.
+
+Feeds payloads captured by ``trace_recorder`` back through
+``model_serving_utils.parse_endpoint_response`` and, optionally, through the
+FastAPI ``/api/chat`` route with the Databricks client swapped for a stub that
+returns the recorded response. Reports per-record timings and flags records
+whose parsed output no longer matches what was recorded.
+
+Usage:
+    python replay_traces.py traces/
+    python replay_traces.py traces/ --route --repeat 20
+    python replay_traces.py traces/ --request-id <id> --profile replay.prof
+"""
+import argparse
+import cProfile
+import statistics
+import sys
+import time
+
+import model_serving_utils
+from model_serving_utils import parse_endpoint_response
+from trace_recorder import iter_records, set_trace_recorder
+
+
+class ReplayClient:
+    """Stands in for the mlflow deployments client, returning one recorded response."""
+
+    def __init__(self):
+        self.response = None
+
+    def predict(self, endpoint=None, inputs=None):
+        return self.response
+
+
+def _recorded_user_message(record):
+    for item in (record.get("inputs") or {}).get("input", []):
+        if isinstance(item, dict) and item.get("role") == "user":
+            return item.get("content", "")
+    return ""
+
+
+def _expected_content(record):
+    parsed = record.get("parsed")
+    if isinstance(parsed, list) and parsed and isinstance(parsed[0], dict):
+        return parsed[0].get("content")
+    return None
+
+
+def replay_parse(record, repeat):
+    """Run the recorded response through the parser; return (timings_ms, mismatch)."""
+    timings = []
+    messages = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        messages, _ = parse_endpoint_response(record["response"])
+        timings.append((time.perf_counter() - started) * 1000)
+    mismatch = record.get("parsed") is not None and messages != record["parsed"]
+    return timings, mismatch
+
+
+def replay_route(client, replay_client, response_cache, record, repeat):
+    """POST the recorded prompt to /api/chat against the recorded response."""
+    replay_client.response = record["response"]
+    expected = _expected_content(record)
+    timings = []
+    mismatch = False
+    for _ in range(repeat):
+        # Each replay must go through the parser, not the response cache
+        response_cache.clear()
+        started = time.perf_counter()
+        resp = client.post("/api/chat", json={"message": _recorded_user_message(record)})
+        timings.append((time.perf_counter() - started) * 1000)
+        if resp.status_code != 200:
+            mismatch = True
+        elif expected is not None and resp.json().get("message") != expected:
+            mismatch = True
+    return timings, mismatch
+
+
+def _summary(timings):
+    if not timings:
+        return "n/a"
+    return (f"median={statistics.median(timings):.3f}ms "
+            f"min={min(timings):.3f}ms max={max(timings):.3f}ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded endpoint traces offline")
+    parser.add_argument("directory", help="Trace directory (the TRACE_RECORD_DIR used when recording)")
+    parser.add_argument("--request-id", help="Only replay this request_id")
+    parser.add_argument("--since", type=float, help="Only replay records at or after this epoch time")
+    parser.add_argument("--until", type=float, help="Only replay records at or before this epoch time")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each record this many times")
+    parser.add_argument("--route", action="store_true", help="Also replay through the /api/chat route")
+    parser.add_argument("--profile", help="Write a cProfile capture of the replay to this path")
+    args = parser.parse_args(argv)
+
+    # Never re-record what we are replaying
+    set_trace_recorder(None)
+
+    client = replay_client = response_cache = None
+    if args.route:
+        from fastapi.testclient import TestClient
+        replay_client = ReplayClient()
+        model_serving_utils.get_deploy_client = lambda *a, **kw: replay_client
+        from backend.main import app, response_cache
+        client = TestClient(app)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    parse_timings, route_timings, mismatches, count = [], [], [], 0
+    for record in iter_records(args.directory, request_id=args.request_id, since=args.since, until=args.until):
+        count += 1
+        timings, mismatch = replay_parse(record, args.repeat)
+        parse_timings.extend(timings)
+        if mismatch:
+            mismatches.append(("parse", record.get("request_id")))
+        if client is not None:
+            timings, mismatch = replay_route(client, replay_client, response_cache, record, args.repeat)
+            route_timings.extend(timings)
+            if mismatch:
+                mismatches.append(("route", record.get("request_id")))
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
+    print(f"Replayed {count} record(s) x{args.repeat}")
+    print(f"parse: {_summary(parse_timings)}")
+    if client is not None:
+        print(f"route: {_summary(route_timings)}")
+    for stage, request_id in mismatches:
+        print(f"MISMATCH [{stage}] request_id={request_id}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""
+Per-request timing spans.
+
+A RequestTimer is bound to the current request through a context variable, so
+code outside the web layer (e.g. ``model_serving_utils``) can record spans
+without knowing whether instrumentation is on. With no active timer, ``span``
+is a no-op.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current_timer = contextvars.ContextVar("request_timer", default=None)
+
+
+class RequestTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # name -> accumulated milliseconds, in first-seen order
+        self.spans = {}
+
+    def add(self, name, duration_ms):
+        self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+
+    def mark_admitted(self):
+        """Record time from request arrival until the handler started running."""
+        self.add("admission", (time.perf_counter() - self.started) * 1000)
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing_header(self):
+        parts = [f"{name};dur={duration:.1f}" for name, duration in self.spans.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+
+def start_timer():
+    """Bind a new timer to the current context; returns (timer, token) for stop_timer."""
+    timer = RequestTimer()
+    return timer, _current_timer.set(timer)
+
+
+def stop_timer(token):
+    _current_timer.reset(token)
+
+
+def current_timer():
+    return _current_timer.get()
+
+
+def mark_admitted():
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.mark_admitted()
+
+
+@contextmanager
+def span(name):
+    """Time the enclosed block into the current request's timer, if any."""
+    timer = _current_timer.get()
+    if timer is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, (time.perf_counter() - started) * 1000)
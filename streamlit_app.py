@@ -1,12 +1,15 @@
 import streamlit as st
 import os
 import json
+import threading
 import time
 from datetime import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-from model_serving_utils import query_endpoint, query_endpoint_stream, endpoint_supports_feedback, submit_feedback
+# plotly is imported inside the chart helpers, and mlflow/databricks.sdk inside
+# model_serving_utils, so neither is paid for when the script first loads
+from model_serving_utils import query_endpoint, query_endpoint_stream, endpoint_supports_feedback, submit_feedback, warm_up_imports
+from markdown_render import render_markdown_cached
+from generation_policy import load_policy_from_env, split_params
+from token_usage import get_usage_tracker
 
 # Page configuration
 st.set_page_config(
@@ -19,23 +22,105 @@ st.set_page_config(
 # Get serving endpoint from environment
 SERVING_ENDPOINT = os.getenv('SERVING_ENDPOINT', 'mas-f63d2792-endpoint')
 
+# Start importing mlflow/databricks.sdk in the background while the dashboard renders
+warm_up_imports()
+
+class FeedbackSupportCheck:
+    """
+    Checks feedback support once per process in a background thread, retrying after
+    failures, so no page render waits on databricks.sdk or the workspace API.
+    supported stays None (treated as unsupported) until a check succeeds.
+    """
+    RETRY_SECONDS = 60
+
+    def __init__(self, endpoint_name):
+        self.endpoint_name = endpoint_name
+        self.supported = None
+        threading.Thread(target=self._run, name="feedback-check", daemon=True).start()
+
+    def _run(self):
+        while self.supported is None:
+            try:
+                self.supported = endpoint_supports_feedback(self.endpoint_name, raise_errors=True)
+            except Exception as e:
+                print(f"Error checking feedback support: {e}")
+                time.sleep(self.RETRY_SECONDS)
+
+@st.cache_resource
+def feedback_support_check(endpoint_name):
+    return FeedbackSupportCheck(endpoint_name)
+
+def collections_chart(months, values):
+    """Build the collections line chart (plotly.graph_objects only; no pandas/plotly.express)"""
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Scatter(x=months, y=values, mode="lines+markers", name="Collections"))
+    fig.update_layout(
+        title="Monthly Collections",
+        xaxis_title="Month",
+        yaxis_title="Collections",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+def revenue_chart(months, values):
+    """Build the revenue bar chart coloured by value"""
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Bar(
+        x=months,
+        y=values,
+        name="Revenue",
+        marker=dict(color=values, colorscale='Blues', showscale=True, colorbar=dict(title="Revenue"))
+    ))
+    fig.update_layout(
+        title="Monthly Revenue",
+        xaxis_title="Month",
+        yaxis_title="Revenue",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)'
+    )
+    return fig
+
+@st.cache_resource
+def cached_generation_policy():
+    """Load the generation policy once per process"""
+    return load_policy_from_env()
+
+def current_user():
+    """Identify the viewer from the headers Databricks Apps forwards (Streamlit >= 1.37)"""
+    headers = getattr(getattr(st, "context", None), "headers", None) or {}
+    return headers.get("X-Forwarded-Email") or headers.get("X-Forwarded-User") or "anonymous"
+
+# Number of chat messages rendered per rerun; older ones are paged in on demand
+HISTORY_WINDOW_SIZE = 50
+
+def render_assistant_message(content):
+    """Show an assistant message from its cached, sanitized HTML rendering"""
+    html = render_markdown_cached(content)
+    if hasattr(st, "html"):
+        st.html(html)
+    else:
+        st.markdown(html, unsafe_allow_html=True)
+
 # Initialize session state
 if "messages" not in st.session_state:
     st.session_state.messages = []
-if "endpoint_supports_feedback" not in st.session_state:
-    try:
-        st.session_state.endpoint_supports_feedback = endpoint_supports_feedback(SERVING_ENDPOINT)
-    except:
-        st.session_state.endpoint_supports_feedback = False
+if "history_window" not in st.session_state:
+    st.session_state.history_window = HISTORY_WINDOW_SIZE
+# Read on every rerun: the background check may finish after the session starts
+st.session_state.endpoint_supports_feedback = bool(feedback_support_check(SERVING_ENDPOINT).supported)
 
 # Sidebar
 with st.sidebar:
     st.title("🔧 Settings")
     st.write(f"**Endpoint:** {SERVING_ENDPOINT}")
     st.write(f"**Feedback Support:** {'✅' if st.session_state.endpoint_supports_feedback else '❌'}")
+    user_usage = get_usage_tracker().user_totals(current_user())
+    st.write(f"**Tokens used:** {user_usage['window']['total_tokens']:,}")
     
     if st.button("🗑️ Clear Chat History"):
         st.session_state.messages = []
+        st.session_state.history_window = HISTORY_WINDOW_SIZE
         st.rerun()
 
 # Main app
@@ -86,44 +171,17 @@ with tab1:
     
     with col1:
         st.subheader("📊 Collections Trend")
-        collections_data = {
-            'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-            'Collections': [1200, 1350, 1100, 1400, 1600, 1800]
-        }
-        df_collections = pd.DataFrame(collections_data)
-        
-        fig_collections = px.line(
-            df_collections, 
-            x='Month', 
-            y='Collections',
-            title="Monthly Collections",
-            markers=True
-        )
-        fig_collections.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)'
+        fig_collections = collections_chart(
+            ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+            [1200, 1350, 1100, 1400, 1600, 1800]
         )
         st.plotly_chart(fig_collections, use_container_width=True)
     
     with col2:
         st.subheader("💰 Revenue Trend")
-        revenue_data = {
-            'Month': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
-            'Revenue': [45000, 52000, 48000, 55000, 62000, 68000]
-        }
-        df_revenue = pd.DataFrame(revenue_data)
-        
-        fig_revenue = px.bar(
-            df_revenue, 
-            x='Month', 
-            y='Revenue',
-            title="Monthly Revenue",
-            color='Revenue',
-            color_continuous_scale='Blues'
-        )
-        fig_revenue.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)'
+        fig_revenue = revenue_chart(
+            ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun'],
+            [45000, 52000, 48000, 55000, 62000, 68000]
         )
         st.plotly_chart(fig_revenue, use_container_width=True)
     
@@ -151,10 +209,18 @@ with tab2:
     st.header("💬 AI Assistant")
     st.markdown("Ask me anything about your data intelligence platform!")
     
-    # Display chat messages
-    for message in st.session_state.messages:
+    # Display only the most recent window of chat messages
+    hidden_count = len(st.session_state.messages) - st.session_state.history_window
+    if hidden_count > 0:
+        if st.button(f"Show {min(hidden_count, HISTORY_WINDOW_SIZE)} earlier messages"):
+            st.session_state.history_window += HISTORY_WINDOW_SIZE
+            st.rerun()
+    for message in st.session_state.messages[-st.session_state.history_window:]:
         with st.chat_message(message["role"]):
-            st.markdown(message["content"])
+            if message["role"] == "assistant":
+                render_assistant_message(message["content"])
+            else:
+                st.markdown(message["content"])
     
     # Chat input
     if prompt := st.chat_input("Ask me anything about your data..."):
@@ -170,12 +236,24 @@ with tab2:
                     # Prepare messages for the model serving endpoint
                     input_messages = [{"role": "user", "content": prompt}]
                     
+                    # Budget the request by prompt class and user, within the user's quota
+                    user = current_user()
+                    usage_tracker = get_usage_tracker()
+                    max_tokens, extra_inputs = split_params(
+                        cached_generation_policy().resolve("streamlit", prompt, user)
+                    )
+                    remaining = usage_tracker.check(user, SERVING_ENDPOINT)
+                    if remaining is not None:
+                        max_tokens = min(max_tokens, remaining)
+                    
                     # Query the Databricks model serving endpoint
                     response_messages, request_id = query_endpoint(
                         endpoint_name=SERVING_ENDPOINT,
                         messages=input_messages,
-                        max_tokens=2000,
-                        return_traces=st.session_state.endpoint_supports_feedback
+                        max_tokens=max_tokens,
+                        return_traces=st.session_state.endpoint_supports_feedback,
+                        extra_inputs=extra_inputs,
+                        on_usage=lambda usage: usage_tracker.record(user, SERVING_ENDPOINT, "streamlit", usage)
                     )
                     
                     # Extract the assistant's response
@@ -187,7 +265,7 @@ with tab2:
                         assistant_message = "I'm sorry, I couldn't generate a response. Please try again."
                     
                     # Display the response
-                    st.markdown(assistant_message)
+                    render_assistant_message(assistant_message)
                     
                     # Add assistant message to chat history
                     st.session_state.messages.append({
@@ -0,0 +1,140 @@
+"""
+Token accounting and quotas.
+
+Tokens consumed are read from endpoint response metadata (the ``usage`` block
+of Responses-style or chat-completions-style replies) and totalled per user,
+endpoint and route, both for the lifetime of the process and for the current
+quota window. Quotas cap total tokens per user and per endpoint within a
+window and are configured with the ``TOKEN_QUOTAS`` environment variable, e.g.::
+
+    {"per_user": 200000, "per_endpoint": 5000000, "window_seconds": 86400,
+     "users": {"analyst@example.com": 1000000}}
+
+A missing or null limit means unlimited.
+"""
+import json
+import os
+import threading
+import time
+
+DEFAULT_WINDOW_SECONDS = 24 * 60 * 60
+
+
+def _empty_totals():
+    return {"requests": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+
+def _add(totals, usage):
+    totals["requests"] += 1
+    for key in ("input_tokens", "output_tokens", "total_tokens"):
+        totals[key] += usage.get(key, 0)
+
+
+class QuotaExceeded(Exception):
+    """Raised when a user or endpoint has used up its token quota for the window."""
+
+
+class UsageTracker:
+    def __init__(self, quotas=None):
+        quotas = quotas or {}
+        self.per_user = quotas.get("per_user")
+        self.per_endpoint = quotas.get("per_endpoint")
+        self.user_limits = quotas.get("users", {})
+        self.window_seconds = quotas.get("window_seconds", DEFAULT_WINDOW_SECONDS)
+        self._lock = threading.Lock()
+        self._window_started = time.time()
+        self._window = {"users": {}, "endpoints": {}}
+        self._lifetime = {"users": {}, "endpoints": {}, "routes": {}}
+
+    def _roll_window(self):
+        if time.time() - self._window_started >= self.window_seconds:
+            self._window_started = time.time()
+            self._window = {"users": {}, "endpoints": {}}
+
+    def _user_limit(self, user):
+        return self.user_limits.get(user, self.per_user)
+
+    def _remaining_by_limit(self, user, endpoint):
+        """
+        Tokens left under each configured limit as {description: remaining}; call with the
+        lock held. A user of None checks only the endpoint limit.
+        """
+        self._roll_window()
+        remaining = {}
+        user_limit = self._user_limit(user) if user is not None else None
+        if user_limit is not None:
+            used = self._window["users"].get(user, _empty_totals())["total_tokens"]
+            remaining[f"user '{user}'"] = user_limit - used
+        if self.per_endpoint is not None:
+            used = self._window["endpoints"].get(endpoint, _empty_totals())["total_tokens"]
+            remaining[f"endpoint '{endpoint}'"] = self.per_endpoint - used
+        return remaining
+
+    def remaining(self, user, endpoint):
+        """Tokens left in the current window for this user/endpoint (None = unlimited)."""
+        with self._lock:
+            remaining = self._remaining_by_limit(user, endpoint)
+        return max(min(remaining.values()), 0) if remaining else None
+
+    def check(self, user, endpoint):
+        """Raise QuotaExceeded naming the exhausted limit(s); otherwise return the remaining budget."""
+        with self._lock:
+            remaining = self._remaining_by_limit(user, endpoint)
+        exhausted = [limit for limit, left in remaining.items() if left <= 0]
+        if exhausted:
+            raise QuotaExceeded(f"Token quota exhausted for {' and '.join(exhausted)}")
+        return min(remaining.values()) if remaining else None
+
+    def record(self, user, endpoint, route, usage, count_toward_quota=True):
+        """
+        Add one response's token usage to the lifetime totals and, unless
+        count_toward_quota is False, to the current quota window.
+        """
+        if not usage:
+            return
+        with self._lock:
+            self._roll_window()
+            if count_toward_quota:
+                for scope, key in (("users", user), ("endpoints", endpoint)):
+                    _add(self._window[scope].setdefault(key, _empty_totals()), usage)
+            for scope, key in (("users", user), ("endpoints", endpoint), ("routes", route)):
+                _add(self._lifetime[scope].setdefault(key, _empty_totals()), usage)
+
+    def user_totals(self, user):
+        with self._lock:
+            self._roll_window()
+            return {
+                "window": dict(self._window["users"].get(user, _empty_totals())),
+                "lifetime": dict(self._lifetime["users"].get(user, _empty_totals())),
+            }
+
+    def totals(self):
+        """Endpoint and route totals; per-user figures are left out because they carry user identities."""
+        with self._lock:
+            self._roll_window()
+            return {
+                "window": {
+                    "started": self._window_started,
+                    "seconds": self.window_seconds,
+                    "endpoints": {k: dict(v) for k, v in self._window["endpoints"].items()},
+                },
+                "lifetime": {
+                    scope: {k: dict(v) for k, v in self._lifetime[scope].items()}
+                    for scope in ("endpoints", "routes")
+                },
+                "quotas": {
+                    "per_user": self.per_user,
+                    "per_endpoint": self.per_endpoint,
+                },
+            }
+
+_tracker = None
+
+
+def get_usage_tracker():
+    """Return the process-wide tracker, configured from TOKEN_QUOTAS on first use."""
+    global _tracker
+    if _tracker is None:
+        quotas = os.getenv("TOKEN_QUOTAS")
+        _tracker = UsageTracker(json.loads(quotas) if quotas else None)
+    return _tracker
@@ -0,0 +1,189 @@
+"""
+Append-only recorder for raw model serving request/response pairs.
+
+Each record is written as its own gzip member appended to a segment file, so a
+segment stays a readable .gz stream even if the process dies mid-write. An
+``index.jsonl`` file next to the segments maps request_id and timestamp to the
+byte range of every record, which lets ``replay_traces.py`` seek straight to a
+payload without decompressing whole segments.
+
+Recording is enabled by pointing ``TRACE_RECORD_DIR`` at a writable directory.
+``submit`` hands records to a background writer thread, so serialization,
+compression and file I/O stay off the request path. The queue is bounded by
+``TRACE_QUEUE_SIZE``; records submitted while it is full are dropped and counted.
+"""
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+
+TRACE_DIR_ENV = "TRACE_RECORD_DIR"
+TRACE_SEGMENT_BYTES_ENV = "TRACE_SEGMENT_BYTES"
+TRACE_QUEUE_SIZE_ENV = "TRACE_QUEUE_SIZE"
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_QUEUE_SIZE = 32
+INDEX_FILENAME = "index.jsonl"
+
+
+class TraceRecorder:
+    """Writes request/response pairs to rotating compressed segment files."""
+
+    def __init__(self, directory, segment_bytes=DEFAULT_SEGMENT_BYTES, queue_size=DEFAULT_QUEUE_SIZE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_FILENAME)
+        self._segment = self._latest_segment()
+
+    def _segment_name(self, number):
+        return f"segment-{number:06d}.gz"
+
+    def _latest_segment(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".gz"):
+                try:
+                    numbers.append(int(name[len("segment-"):-len(".gz")]))
+                except ValueError:
+                    continue
+        return max(numbers, default=1)
+
+    def submit(self, endpoint_name, inputs, response, parsed=None, request_id=None, latency_ms=None):
+        """
+        Queue one request/response pair for the background writer. The response is
+        held by reference until written; returns False if the queue was full.
+        """
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                    self._writer.start()
+        try:
+            self._queue.put_nowait((endpoint_name, inputs, response, parsed, request_id, latency_ms, time.time()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                endpoint_name, inputs, response, parsed, request_id, latency_ms, timestamp = item
+                self.record(endpoint_name, inputs, response, parsed=parsed, request_id=request_id,
+                            latency_ms=latency_ms, timestamp=timestamp)
+            except Exception as e:
+                print(f"ERROR: Failed to write trace: {e}")
+            finally:
+                # Release the payload before blocking on the next one
+                item = None
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every submitted record has been written."""
+        self._queue.join()
+
+    def record(self, endpoint_name, inputs, response, parsed=None, request_id=None, latency_ms=None, timestamp=None):
+        """Append one request/response pair synchronously and return its index entry."""
+        timestamp = timestamp if timestamp is not None else time.time()
+        payload = gzip.compress(json.dumps({
+            "endpoint": endpoint_name,
+            "timestamp": timestamp,
+            "request_id": request_id,
+            "latency_ms": latency_ms,
+            "inputs": inputs,
+            "response": response,
+            "parsed": parsed,
+        }, default=str).encode("utf-8"))
+
+        with self._lock:
+            path = os.path.join(self.directory, self._segment_name(self._segment))
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            if size and size + len(payload) > self.segment_bytes:
+                self._segment += 1
+                path = os.path.join(self.directory, self._segment_name(self._segment))
+
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(payload)
+
+            entry = {
+                "request_id": request_id,
+                "timestamp": timestamp,
+                "endpoint": endpoint_name,
+                "segment": self._segment_name(self._segment),
+                "offset": offset,
+                "length": len(payload),
+            }
+            with open(self._index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+        return entry
+
+
+def iter_index(directory, request_id=None, since=None, until=None):
+    """Yield index entries, optionally filtered by request_id and a time window (epoch seconds)."""
+    index_path = os.path.join(directory, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        return
+    with open(index_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crashed writer; everything before it is intact
+                continue
+            if request_id is not None and entry.get("request_id") != request_id:
+                continue
+            if since is not None and entry["timestamp"] < since:
+                continue
+            if until is not None and entry["timestamp"] > until:
+                continue
+            yield entry
+
+
+def load_record(directory, entry):
+    """Read and decompress the record an index entry points at."""
+    with open(os.path.join(directory, entry["segment"]), "rb") as f:
+        f.seek(entry["offset"])
+        payload = f.read(entry["length"])
+    return json.loads(gzip.decompress(payload))
+
+
+def iter_records(directory, request_id=None, since=None, until=None):
+    """Yield full records matching the given filters, in recording order."""
+    for entry in iter_index(directory, request_id=request_id, since=since, until=until):
+        yield load_record(directory, entry)
+
+
+_recorder = None
+_recorder_configured = False
+
+
+def get_trace_recorder():
+    """Return the process-wide recorder, or None when TRACE_RECORD_DIR is not set."""
+    global _recorder, _recorder_configured
+    if not _recorder_configured:
+        directory = os.getenv(TRACE_DIR_ENV)
+        if directory:
+            segment_bytes = int(os.getenv(TRACE_SEGMENT_BYTES_ENV, DEFAULT_SEGMENT_BYTES))
+            queue_size = int(os.getenv(TRACE_QUEUE_SIZE_ENV, DEFAULT_QUEUE_SIZE))
+            _recorder = TraceRecorder(directory, segment_bytes=segment_bytes, queue_size=queue_size)
+        _recorder_configured = True
+    return _recorder
+
+
+def set_trace_recorder(recorder):
+    """Override the process-wide recorder (pass None to disable recording)."""
+    global _recorder, _recorder_configured
+    _recorder = recorder
+    _recorder_configured = True